@@ -0,0 +1,126 @@
+import json
+import os
+import pandas as pd
+
+# Evaluation of the affiliations identified by ident-aff.py against the manually labelled commits.
+# Everything is computed with vectorized joins and group-bys, for every project in one run.
+
+THRESHOLD = 5
+
+PROJECTS = [
+    'pytorch/pytorch',
+    'tensorflow/tensorflow',
+    'huggingface/transformers',
+]
+
+# affiliations outside the most frequent ones are pooled into OTHER in the confusion matrices
+CONFUSION_TOP_N = 10
+NO_AFF = '<none>'
+OTHER = '<other>'
+
+def load_predictions(name_with_owner, data_dir='data_git', threshold=THRESHOLD):
+    """Load the merged commits of a project, where the affiliation found by email overrides the others."""
+    df_commits = pd.read_csv(os.path.join(data_dir, name_with_owner.replace('/', '_') + f'_commits_merged_{threshold}commits.csv'), index_col=0)
+    _by_email = df_commits['aff_email'].notna()
+    df_commits['aff'] = df_commits['aff_email'].where(_by_email, df_commits['aff'])
+    df_commits['ident_by'] = df_commits['ident_by'].where(~_by_email, 'email')
+    if 'sha' in df_commits.columns:
+        df_commits = df_commits.dropna(subset=['sha']).set_index('sha')
+    return df_commits
+
+def load_ground_truth(name_with_owner, data_dir='data_git', threshold=THRESHOLD):
+    return pd.read_csv(os.path.join(data_dir, name_with_owner.replace('/', '_') + f'_commits_labelled_{threshold}commits.csv'), index_col=0)
+
+def join_ground_truth(df_commits, df_gt):
+    """Inner join the predictions with the ground truth, both affiliations lowercased and Meta read as facebook."""
+    df_join = df_commits.join(df_gt[['aff', 'ident_by']], how='inner', rsuffix='_gt')
+    df_join['aff_gt'] = df_join['aff_gt'].str.replace('Meta', 'facebook').str.lower()
+    df_join['aff'] = df_join['aff'].str.lower()
+    return df_join
+
+def confusion_matrix(aff, aff_gt, top_n=CONFUSION_TOP_N):
+    """Counts of (ground truth, predicted) affiliations over the top_n most frequent true affiliations.
+
+    Missing predictions count as NO_AFF and every other affiliation as OTHER.
+    """
+    labels = list(aff_gt.value_counts().index[:top_n])
+    _pool = lambda values: values.where(values.isin(labels), OTHER).where(values.notna(), NO_AFF)
+    matrix = pd.crosstab(_pool(aff_gt), _pool(aff))
+    labels = labels + [label for label in (OTHER, NO_AFF) if label in matrix.index or label in matrix.columns]
+    matrix = matrix.reindex(index=labels, columns=labels, fill_value=0)
+    return {'labels': labels, 'matrix': matrix.values.tolist()}
+
+def affiliation_metrics(aff, aff_gt):
+    """Precision and recall of every affiliation, as (precision, recall, support) DataFrame columns.
+
+    An affiliation's precision is over the commits predicted with it, its recall over the commits
+    labelled with it (the support). Commits without a prediction only lower the recall.
+    """
+    _true_positives = aff_gt[aff == aff_gt].value_counts()
+    _predicted = aff.value_counts()
+    _support = aff_gt.value_counts()
+    return pd.DataFrame({
+        'precision': _true_positives.reindex(_predicted.index, fill_value=0) / _predicted,
+        'recall': _true_positives.reindex(_support.index, fill_value=0) / _support,
+        'support': _support,
+    }).fillna({'support': 0}).astype({'support': 'int64'}).sort_values('support', ascending=False, kind='stable')
+
+def method_metrics(df, top_n=CONFUSION_TOP_N):
+    """Metrics of the predicted aff against aff_gt for commits with a ground truth.
+
+    accuracy is over all the commits and micro_precision over the commits with a predicted
+    affiliation (micro recall would equal accuracy). macro_precision and macro_recall average the
+    per-affiliation precision over the predicted affiliations and recall over the labelled ones.
+    """
+    _predicted = df['aff'].notna()
+    _correct = int((df['aff'] == df['aff_gt']).sum())
+    _errors = df[_predicted & (df['aff'] != df['aff_gt'])].groupby(['aff', 'aff_gt']).size().nlargest(3)
+    _by_aff = affiliation_metrics(df['aff'], df['aff_gt'])
+    _to_float = lambda value: None if pd.isna(value) else float(value)
+    return {
+        'commits': len(df),
+        'predicted': int(_predicted.sum()),
+        'correct': _correct,
+        'accuracy': _correct / len(df) if len(df) else None,
+        'coverage': int(_predicted.sum()) / len(df) if len(df) else None,
+        'micro_precision': _correct / int(_predicted.sum()) if _predicted.any() else None,
+        'macro_precision': _to_float(_by_aff['precision'].mean()),
+        'macro_recall': _to_float(_by_aff['recall'].mean()),
+        'by_affiliation': {
+            aff: {'precision': _to_float(row['precision']), 'recall': _to_float(row['recall']), 'support': int(row['support'])}
+            for aff, row in _by_aff.head(top_n).iterrows()
+        },
+        'top_errors': [{'aff': aff, 'aff_gt': aff_gt, 'commits': int(count)} for (aff, aff_gt), count in _errors.items()],
+        'confusion': confusion_matrix(df['aff'], df['aff_gt'], top_n),
+    }
+
+def evaluate(df_join, top_n=CONFUSION_TOP_N):
+    """Coverage and metrics of a joined project, overall and per ident_by method."""
+    report = {
+        'commits': len(df_join),
+        'auto_identified': int(df_join['aff'].notna().sum()),
+        'manually_identified': int(df_join['aff_gt'].notna().sum()),
+        'both_identified': int((df_join['aff'].notna() & df_join['aff_gt'].notna()).sum()),
+    }
+    df_labelled = df_join.dropna(subset=['aff_gt'])
+    report['overall'] = method_metrics(df_labelled, top_n)
+    report['by_method'] = {
+        ident_by: method_metrics(_df, top_n)
+        for ident_by, _df in df_labelled.groupby('ident_by', sort=True)
+    }
+    return report
+
+def evaluate_projects(projects=PROJECTS, data_dir='data_git', threshold=THRESHOLD, top_n=CONFUSION_TOP_N):
+    """Evaluate every project, returning {name_with_owner: report}."""
+    reports = {}
+    for name_with_owner in projects:
+        df_join = join_ground_truth(load_predictions(name_with_owner, data_dir, threshold),
+                                    load_ground_truth(name_with_owner, data_dir, threshold))
+        reports[name_with_owner] = evaluate(df_join, top_n)
+    return reports
+
+def save_report(reports, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(reports, f, indent=4)
+    os.replace(tmp_path, path)
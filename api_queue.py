@@ -0,0 +1,107 @@
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+from common import get_session, get_token_scheduler, get_with_timeout
+
+# Concurrent GitHub API fallback for commits whose stats could not be read from the local clone.
+# Requests still go through common.get_with_timeout (pooled session, response cache, retries),
+# asyncio only schedules them on a thread pool.
+
+def refresh_rate_limits(headers):
+    # Ask the API for the remaining core budget of every token, /rate_limit itself doesn't count against it
+    scheduler = get_token_scheduler()
+    for token in scheduler.tokens or [None]:
+        request_headers = dict(headers)
+        if token is not None:
+            request_headers['Authorization'] = f'token {token}'
+        try:
+            response = get_session().get(f'{config.github_api_url}/rate_limit', headers=request_headers, timeout=config.timeout)
+            response.raise_for_status()
+            core = response.json()['resources']['core']
+            scheduler.update(token, {'X-RateLimit-Remaining': core['remaining'], 'X-RateLimit-Reset': core['reset']})
+        except Exception as e:
+            print(f"Failed to read the rate limit: {str(e)}")
+    return scheduler
+
+def get_last_page(response):
+    # Read the page count from the rel="last" link, 1 when the response is not paginated
+    for link in response.headers.get('Link', '').split(', '):
+        if 'rel="last"' in link:
+            return int(re.search(r'[?&]page=(\d+)', link).group(1))
+    return 1
+
+def get_file_stats(commit_data):
+    return [(file['filename'], file['additions'], file['deletions'], file['changes']) for file in commit_data.get('files', [])]
+
+class RateLimitBudget:
+    """Bounds in-flight requests by the remaining rate limit budget of all tokens.
+
+    The concurrency never exceeds max_concurrency or the combined headroom of the tokens,
+    and once every token is spent new requests wait for the earliest reset time.
+    """
+
+    def __init__(self, scheduler, max_concurrency):
+        self.scheduler = scheduler
+        headroom = scheduler.total_headroom() if len(scheduler) else max_concurrency
+        self.semaphore = asyncio.Semaphore(max(1, min(max_concurrency, headroom)))
+
+    async def acquire(self):
+        await self.semaphore.acquire()
+        while len(self.scheduler) and self.scheduler.total_headroom() <= 0:
+            wait_time = max(1, self.scheduler.next_available() - time.time())
+            print(f"Rate limit budget spent. Waiting for {int(wait_time)} seconds...")
+            await asyncio.sleep(wait_time)
+
+    def release(self):
+        self.semaphore.release()
+
+async def fetch_page(loop, executor, budget, url, headers, page):
+    await budget.acquire()
+    try:
+        return await loop.run_in_executor(executor, lambda: get_with_timeout(url, headers, {'per_page': 100, 'page': page}, True))
+    finally:
+        budget.release()
+
+async def fetch_commit_stats(loop, executor, budget, repo_owner, repo_name, sha, headers):
+    url = f'{config.github_api_url}/repos/{repo_owner}/{repo_name}/commits/{sha}'
+    # A commit missing any page (get_with_timeout already retried it) has no stats rather than partial ones
+    response = await fetch_page(loop, executor, budget, url, headers, 1)
+    if response is None:
+        print(f"An error occurred while fetching commit data for {url}")
+        return sha, None
+    file_stats = get_file_stats(response.json())
+
+    # Once the last page is known the remaining pages are fetched in parallel
+    page_count = get_last_page(response)
+    if page_count > 1:
+        responses = await asyncio.gather(*(fetch_page(loop, executor, budget, url, headers, page) for page in range(2, page_count + 1)))
+        failed_pages = [page for page, response in enumerate(responses, 2) if response is None]
+        if failed_pages:
+            print(f"An error occurred while fetching pages {failed_pages} of {page_count} of the commit data for {url}")
+            return sha, None
+        for response in responses:
+            file_stats.extend(get_file_stats(response.json()))
+    return sha, file_stats
+
+async def fetch_all_commit_stats(repo_owner, repo_name, shas, headers, max_concurrency):
+    loop = asyncio.get_running_loop()
+    budget = RateLimitBudget(refresh_rate_limits(headers), max_concurrency)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        results = await asyncio.gather(*(fetch_commit_stats(loop, executor, budget, repo_owner, repo_name, sha, headers) for sha in shas))
+    return dict(results)
+
+def fetch_commit_stats_concurrently(repo_owner, repo_name, shas, max_concurrency=None):
+    """Return {sha: [(file_name, additions, deletions, changes), ...]} for every sha, fetched concurrently.
+
+    The stats are None for a sha whose pages could not all be fetched.
+    """
+    headers = {
+        'User-Agent': 'request',
+        'Accept': 'application/vnd.github.v3+json'
+    }
+    if not shas:
+        return {}
+    max_concurrency = max_concurrency or config.api_max_concurrency
+    return asyncio.run(fetch_all_commit_stats(repo_owner, repo_name, list(shas), headers, max_concurrency))
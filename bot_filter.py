@@ -0,0 +1,108 @@
+import json
+import re
+from collections import Counter
+import numpy as np
+import pandas as pd
+import bot_dict
+
+# Bot filtering shared by every pipeline stage.
+# The bots of a repository are the union of its bots.json and bot_dict.py lists, empty entries ignored.
+
+BOTS_JSON_PATH = 'bots.json'
+
+def load_bot_names(name_with_owner=None, bots_json_path=BOTS_JSON_PATH, include_bot_dict=True):
+    """Return the bot names listed for a repository, or for every repository when name_with_owner is None.
+    With include_bot_dict=False only bots.json is read.
+    """
+    with open(bots_json_path, 'r') as f:
+        bots_json = json.load(f)
+    bot_names = set()
+    for bot_lists in (bots_json, bot_dict.bot_dict) if include_bot_dict else (bots_json,):
+        if name_with_owner is None:
+            selected = bot_lists.values()
+        else:
+            selected = [bot_lists.get(name_with_owner, [])]
+        for names in selected:
+            bot_names.update(name for name in names if name)
+    return bot_names
+
+class BotFilter:
+    """Bot names compiled into exact-match sets and one combined regex.
+
+    Exact matching compares whole values (login, name or email) against the bot names, substring
+    matching finds a bot name anywhere in the value. Both can ignore case. Matches report the bot
+    name, so every filter also returns how many rows each bot accounted for.
+    """
+
+    def __init__(self, bot_names):
+        self.bot_names = sorted(name for name in set(bot_names) if name)
+        self.exact = set(self.bot_names)
+        self.exact_lower = {name.lower(): name for name in self.bot_names}
+        # Longest names first, so the alternation reports the most specific bot
+        alternation = '|'.join(re.escape(name) for name in sorted(self.bot_names, key=len, reverse=True))
+        self.pattern = re.compile(alternation) if self.bot_names else None
+        self.pattern_ignore_case = re.compile(alternation, re.IGNORECASE) if self.bot_names else None
+
+    @classmethod
+    def for_repo(cls, name_with_owner=None, bots_json_path=BOTS_JSON_PATH, include_bot_dict=True):
+        return cls(load_bot_names(name_with_owner, bots_json_path, include_bot_dict))
+
+    def __len__(self):
+        return len(self.bot_names)
+
+    def match(self, value, substring=False, case=True):
+        """Return the bot name matching value, or None."""
+        if not self.bot_names or not isinstance(value, str):
+            return None
+        if substring:
+            found = (self.pattern if case else self.pattern_ignore_case).search(value)
+            if found is None:
+                return None
+            return found.group(0) if case else self.exact_lower[found.group(0).lower()]
+        if case:
+            return value if value in self.exact else None
+        return self.exact_lower.get(value.lower(), None)
+
+    def match_any(self, values, substring=False, case=True):
+        """Return the bot matching the first of several values (e.g. name and email) that matches, or None."""
+        for value in values:
+            bot_name = self.match(value, substring, case)
+            if bot_name is not None:
+                return bot_name
+        return None
+
+    def match_series(self, values, substring=False, case=True):
+        """Vectorized match over a pandas Series, the matching bot name per row or NaN."""
+        values = values.astype(object)
+        if not self.bot_names:
+            return pd.Series(np.nan, index=values.index, dtype=object)
+        strings = values.where(values.map(lambda value: isinstance(value, str)), None)
+        if substring:
+            pattern = self.pattern if case else self.pattern_ignore_case
+            found = strings.str.extract(f'({pattern.pattern})', flags=pattern.flags, expand=False)
+            return found if case else found.str.lower().map(self.exact_lower)
+        if case:
+            return strings.where(strings.isin(self.exact))
+        return strings.str.lower().map(self.exact_lower)
+
+    def filter_frame(self, df, columns, substring=False, case=True):
+        """Drop the rows where any of columns matches a bot in one pass per column.
+
+        Returns the remaining rows and a Counter of dropped rows per bot.
+        """
+        matched = pd.Series(np.nan, index=df.index, dtype=object)
+        for column in columns:
+            matched = matched.fillna(self.match_series(df[column], substring, case))
+        is_bot = matched.notna()
+        return df[~is_bot], Counter(matched[is_bot].value_counts().to_dict())
+
+    def filter_stream(self, rows, fields, counts=None, substring=False, case=True):
+        """Yield the rows (dicts or tuples) none of whose fields match a bot, counting the dropped ones per bot."""
+        if counts is None:
+            counts = Counter()
+        for row in rows:
+            bot_name = self.match_any((row[field] for field in fields), substring, case)
+            if bot_name is not None:
+                counts[bot_name] += 1
+                continue
+            yield row
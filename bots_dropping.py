@@ -1,94 +1,42 @@
-import csv
-import pandas as pd
 import json
+from collections import Counter
+from bot_filter import BotFilter
+from commit_stream import read_commit_chunks, summarize_committers, drop_bots, write_chunks
 
 #This script drops commits made by bots to clean up the source data.
 #Notice that path string in this script is based on initial environment of our exp. Make sure to adjust them to yours before reproduce the analysis.
+#Commits are streamed in chunks of COMMIT_CHUNK_SIZE rows (see commit_stream.py), uid_annotating.py can also run this step fused with its own.
 
-with open("bots.json", "r") as f:
-    bot_dict = json.load(f)
+bot_filter = BotFilter.for_repo("huggingface/transformers")
 
-csv.field_size_limit(500 * 1024 * 1024)
-
-# Function: TO Analyse the committers' INFO
-def committer_summary(commits):
-    committers = {}
-    for idx in range(len(commits)):
-        committer_name = commits[idx]['Committer Name']
-        if committer_name not in committers:
-            committer_info = {}
-            committer_info['commit_num'] = 1
-            committer_info['email_add'] = commits[idx]['Committer Email']
-            committers[committer_name] = committer_info
-        else:
-            committers[committer_name]['commit_num'] += 1
+# Function: TO Save the committers' INFO
+def committer_summary(committers):
     print('Committer_nums: ', len(committers))
     file_path = 'transformers_committers_info.json'
     with open(file_path, 'w') as f:
         json.dump(committers, f)
 
 
-dropped_names = {}
-author_names= {}
-dropping_idx = []
 filename = "Commit/transformers_commit_data.csv"
 # filename = "Commit/pytorch_commit_data.csv"
-with open(filename, encoding='utf-8') as csvfile:
-    reader = csv.DictReader(csvfile)
-    count = 0
-    commits = [row for row in reader]
-original_num = len(commits)
-
-
-committer_summary(commits)
-
-
-# Start Checking
-for idx in range(original_num):
-    flag = 0
-    for name in bot_dict["huggingface/transformers"]:
-        if flag:
-            break
-        if name in commits[idx]['Login Name']:
-            flag += 1
-            if name not in dropped_names:
-                dropped_names[name] = 1
-            else:
-                dropped_names[name] += 1
-            dropping_idx.append(idx)
-        elif commits[idx]['Login Name'] == '':
-            print(commits[idx]['Author Name'], ' ', commits[idx]['Author Email'])
-            if name in commits[idx]['Author Name']:
-                flag += 1
-                dict_name = 'BLANK_LOGIN_WITH_AUTHOR:' + name
-                if dict_name not in dropped_names:
-                    dropped_names[dict_name] = 1
-                else:
-                    dropped_names[dict_name] += 1
-                dropping_idx.append(idx)
-
-    # Record Valid Users
-    if not flag:
-        if commits[idx]['Author Name'] not in author_names:
-            author_names[commits[idx]['Author Name']] = 1
-        else:
-            author_names[commits[idx]['Author Name']] += 1
+committers = {}
+dropped_names = Counter()
+author_names = Counter()
 
 
-# Dropping
-for idx in reversed(dropping_idx):
-    commits.pop(idx)
-final_num = len(commits)
+# Start Checking, Dropping and Recording Results chunk by chunk
+chunks = summarize_committers(read_commit_chunks(filename), committers)
+chunks = drop_bots(chunks, bot_filter, dropped_names, author_names)
+final_num = write_chunks(chunks, 'transformers_commit_botdropped.csv')
+original_num = final_num + sum(dropped_names.values())
 
 
-# Record Results
-df = pd.DataFrame(commits)
-df.to_csv('transformers_commit_botdropped.csv', index=False, header=True)
+committer_summary(committers)
 
 
 # Print Results
 print('====== BOTS DROPPING DONE ======')
-print(dropped_names)
-print('Origin:{}, Final:{}, Dropped:{}, Dropping_Percentage:{}'.format(original_num, final_num, len(dropping_idx), (original_num-final_num)/original_num))
-print(author_names)
+print(dict(dropped_names))
+print('Origin:{}, Final:{}, Dropped:{}, Dropping_Percentage:{}'.format(original_num, final_num, original_num-final_num, (original_num-final_num)/original_num))
+print(dict(author_names))
 print(len(author_names))
\ No newline at end of file
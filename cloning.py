@@ -0,0 +1,83 @@
+import os
+import warnings
+from datetime import date, datetime
+import git
+import config
+
+# Clone modes for the analysed repositories, picked per config.repo_list entry with 'clone_mode':
+#   'full'     plain clone with the whole history and every blob (default)
+#   'blobless' partial clone (--filter=blob:none), file contents are fetched on demand when a diff needs them.
+#              The clone itself is fast, but every numstat/pydriller diff then downloads its blobs from the
+#              remote, one round trip per missing batch, so a full-history analysis ends up fetching nearly every
+#              blob anyway and much slower than a full clone. Only worth it when few commits are diffed.
+#   'shallow'  only the history since the entry's 'shallow_since' date (--shallow-since). Refused unless the
+#              caller analyses nothing earlier; with the whole history analysed it only warns, as the older
+#              commits are silently missing from the results.
+#   'mirror'   clone borrowing its objects (--reference --dissociate) from a shared bare mirror in
+#              config.clone_mirror_dir, which is kept up to date between runs so every working clone of a repo
+#              reuses one download. --dissociate copies the borrowed objects, so the clone keeps working when
+#              the mirror is pruned, moved or deleted.
+
+CLONE_MODES = ('full', 'blobless', 'shallow', 'mirror')
+
+def get_repo_entry(repo_owner, repo_name):
+    """Return the config.repo_list entry of a repository, or an empty dict if it isn't listed."""
+    for repo in config.repo_list:
+        if repo['owner'] == repo_owner and repo['name'] == repo_name:
+            return repo
+    return {}
+
+def update_mirror(url, mirror_path, progress=None):
+    """Create the bare mirror of url, or fetch what it is missing if it already exists."""
+    if os.path.exists(mirror_path):
+        git.Repo(mirror_path).git.remote('update', '--prune')
+    else:
+        os.makedirs(os.path.dirname(mirror_path) or '.', exist_ok=True)
+        git.Repo.clone_from(url, mirror_path, mirror=True, progress=progress)
+
+def get_shallow_since(repo_entry, analysis_since=None):
+    """Return the 'shallow_since' date of a shallow clone entry, checked against the analysed period.
+
+    analysis_since is the earliest date the caller analyses, None for the whole history.
+    """
+    if not repo_entry.get('shallow_since'):
+        raise ValueError(f"Clone mode 'shallow' needs a 'shallow_since' date (YYYY-MM-DD) in the repo_list entry of {repo_entry.get('name')}")
+    try:
+        shallow_since = datetime.fromisoformat(str(repo_entry['shallow_since'])).date()
+    except ValueError:
+        raise ValueError(f"Invalid 'shallow_since' date of {repo_entry.get('name')}: {repo_entry['shallow_since']!r}, expected YYYY-MM-DD") from None
+    if analysis_since is None:
+        warnings.warn(f"{repo_entry.get('name')}: the whole history is analysed but the shallow clone only has the commits "
+                      f"since {shallow_since}, older commits will be missing from the results")
+    else:
+        if isinstance(analysis_since, datetime):
+            analysis_since = analysis_since.date()
+        elif not isinstance(analysis_since, date):
+            analysis_since = datetime.fromisoformat(str(analysis_since)).date()
+        if shallow_since > analysis_since:
+            raise ValueError(f"{repo_entry.get('name')}: 'shallow_since' {shallow_since} is later than the earliest analysed date "
+                             f"{analysis_since}, the commits in between would be missing")
+    return shallow_since.isoformat()
+
+def clone_repo(url, dest_path, repo_entry=None, progress=None, analysis_since=None):
+    """Clone url into dest_path with the clone mode of its config.repo_list entry.
+
+    analysis_since is the earliest date the caller analyses (None for the whole history), checked
+    against the start of a shallow clone.
+    """
+    repo_entry = repo_entry or {}
+    clone_mode = repo_entry.get('clone_mode', 'full')
+    clone_args = {}
+    if clone_mode == 'blobless':
+        clone_args['filter'] = 'blob:none'
+    elif clone_mode == 'shallow':
+        clone_args['shallow_since'] = get_shallow_since(repo_entry, analysis_since)
+    elif clone_mode == 'mirror':
+        mirror_name = f"{repo_entry.get('owner', '')}_{repo_entry.get('name', os.path.basename(dest_path))}.git"
+        mirror_path = os.path.abspath(os.path.join(config.clone_mirror_dir, mirror_name))
+        update_mirror(url, mirror_path, progress)
+        clone_args['reference'] = mirror_path
+        clone_args['dissociate'] = True
+    elif clone_mode != 'full':
+        raise ValueError(f'Unknown clone mode: {clone_mode}')
+    return git.Repo.clone_from(url, dest_path, progress=progress, **clone_args)
@@ -0,0 +1,153 @@
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+# Columnar storage (Parquet or Arrow IPC) for the commit list, the edge lists and the git commit datasets.
+# Rows are buffered per column and flushed as one row group / record batch at a time.
+
+COMMIT_LIST_SCHEMA = pa.schema([
+    ('uid', pa.int64()),
+    ('filepath', pa.string()),
+    ('release', pa.string()),
+    ('release-date', pa.timestamp('s')),
+    ('name', pa.string()),
+    ('email', pa.string()),
+    ('loc-added', pa.int64()),
+    ('loc-deleted', pa.int64()),
+    ('loc-changed', pa.int64()),
+])
+
+BIPARTITE_SCHEMA = pa.schema([
+    ('source-uid', pa.int64()),
+    ('source-name', pa.string()),
+    ('source-email', pa.string()),
+    ('target-uid', pa.int64()),
+    ('target-name', pa.string()),
+    ('target-email', pa.string()),
+    ('filepath', pa.string()),
+    ('release', pa.string()),
+    ('release-date', pa.timestamp('s')),
+    ('loc-added', pa.int64()),
+    ('loc-deleted', pa.int64()),
+    ('loc-changed', pa.int64()),
+])
+
+LONGITUDINAL_SCHEMA = pa.schema([field for field in BIPARTITE_SCHEMA if field.name != 'filepath'])
+
+STATIC_SCHEMA = pa.schema([field for field in LONGITUDINAL_SCHEMA if field.name not in ('release', 'release-date')])
+
+# One row per commit written by build_commits_dataset in commits-from-git.py
+GIT_COMMITS_SCHEMA = pa.schema([
+    ('sha', pa.string()),
+    ('date', pa.timestamp('s', tz='UTC')),
+    ('name', pa.string()),
+    ('email', pa.string()),
+    ('files_cnt', pa.int64()),
+    ('add', pa.int64()),
+    ('del', pa.int64()),
+    ('sum', pa.int64()),
+    ('aff', pa.string()),
+])
+
+# Normalized per-file stats of the git commit datasets, joined to the commits on sha
+GIT_FILE_STATS_SCHEMA = pa.schema([
+    ('sha', pa.string()),
+    ('path', pa.string()),
+    ('add', pa.int64()),
+    ('del', pa.int64()),
+])
+
+# String columns that are stored dictionary-encoded and loaded back as categoricals
+DICTIONARY_COLUMNS = ['filepath', 'release', 'name', 'email', 'source-name', 'source-email', 'target-name', 'target-email', 'path', 'aff']
+
+class TableWriter:
+    """Write rows to a Parquet or Arrow IPC file in row groups of row_group_size rows."""
+
+    def __init__(self, path, schema, storage_format='parquet', row_group_size=100000):
+        self.schema = schema
+        self.storage_format = storage_format
+        self.row_group_size = row_group_size
+        self.columns = [[] for _ in schema]
+        # value -> index of every dictionary-encoded column of an Arrow IPC file, by column position
+        self.dictionaries = {}
+        if storage_format == 'parquet':
+            dictionary_columns = [name for name in schema.names if name in DICTIONARY_COLUMNS]
+            self.writer = pq.ParquetWriter(path, schema, use_dictionary=dictionary_columns, compression='zstd')
+        elif storage_format == 'arrow':
+            # An IPC file holds a single dictionary per column that later batches can only extend (deltas),
+            # so every dictionary column is encoded against one growing dictionary
+            self.dictionaries = {idx: {} for idx, field in enumerate(schema)
+                                 if field.name in DICTIONARY_COLUMNS and pa.types.is_string(field.type)}
+            self.file_schema = pa.schema([pa.field(field.name, pa.dictionary(pa.int32(), pa.string())) if idx in self.dictionaries else field
+                                          for idx, field in enumerate(schema)])
+            options = pa.ipc.IpcWriteOptions(compression='zstd', emit_dictionary_deltas=True)
+            self.writer = pa.ipc.new_file(path, self.file_schema, options=options)
+        else:
+            raise ValueError(f'Unknown columnar storage format: {storage_format}')
+
+    def write_row(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        if len(self.columns[0]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.columns[0]:
+            return
+        batch = pa.record_batch(self.columns, schema=self.schema)
+        if self.dictionaries:
+            batch = self.encode_dictionaries(batch)
+        self.writer.write_batch(batch)
+        self.columns = [[] for _ in self.schema]
+
+    def encode_dictionaries(self, batch):
+        """Dictionary-encode the string columns of a batch for an Arrow IPC file."""
+        columns = list(batch.columns)
+        for idx, dictionary in self.dictionaries.items():
+            indices = [None if value is None else dictionary.setdefault(value, len(dictionary)) for value in columns[idx].to_pylist()]
+            columns[idx] = pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(list(dictionary), pa.string()))
+        return pa.record_batch(columns, schema=self.file_schema)
+
+    def write_batch(self, batch):
+        # Whole record batches (e.g. copied from another file) skip the row buffers,
+        # Parquet reads timestamp[s] back as timestamp[ms] so they are cast to the schema
+        self.flush()
+        table = pa.Table.from_batches([batch]).cast(self.schema)
+        if self.dictionaries:
+            for batch in table.to_batches():
+                self.writer.write_batch(self.encode_dictionaries(batch))
+        else:
+            self.writer.write_table(table)
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def read_table(path, storage_format='parquet'):
+    """Read a table written by TableWriter, with string columns as dictionaries."""
+    if storage_format == 'parquet':
+        schema = pq.read_schema(path)
+        dictionary_columns = [name for name in schema.names if name in DICTIONARY_COLUMNS]
+        return pq.read_table(path, read_dictionary=dictionary_columns)
+    elif storage_format == 'arrow':
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+    raise ValueError(f'Unknown columnar storage format: {storage_format}')
+
+def iter_batches(path, storage_format='parquet'):
+    """Yield the record batches of a table without loading it whole."""
+    if storage_format == 'parquet':
+        yield from pq.ParquetFile(path).iter_batches()
+    else:
+        yield from read_table(path, storage_format).to_batches()
+
+def iter_rows(path, storage_format='parquet'):
+    """Yield the rows of a table as tuples, one record batch at a time."""
+    for batch in iter_batches(path, storage_format):
+        yield from zip(*(column.to_pylist() for column in batch.columns))
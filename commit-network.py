@@ -1,16 +1,31 @@
 import csv
 import os
+from collections import Counter
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime
 import requests
 import config
 from common import get_with_timeout, handle_rate_limit
+from git_log import GIT_OPTIONS, iter_numstat, parse_numstat_line
+from releases import ReleaseTimeline, ReleaseCache, read_local_tags
+from identity import IdentityIndex
+from edge_sinks import open_edge_sink, ThrottledProgress
+from api_queue import fetch_commit_stats_concurrently
+from cloning import clone_repo
+from network_edges import add_file_edges, create_network_cln_sparse, create_network_cln_sharded
+from bot_filter import BotFilter
 import git
 from git import RemoteProgress
 from tqdm.auto import tqdm
-import bot_dict
 import json
 
+# Columnar storage is optional and needs pyarrow
+STORAGE_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+LONGITUDINAL_SCHEMA = BIPARTITE_SCHEMA = STATIC_SCHEMA = None
+if config.storage_format != 'csv':
+    import columnar
+    from columnar import LONGITUDINAL_SCHEMA, BIPARTITE_SCHEMA, STATIC_SCHEMA
+
 class CloneProgress(RemoteProgress):
     def __init__(self):
         super().__init__()
@@ -24,11 +39,8 @@ class CloneProgress(RemoteProgress):
         self.pbar.n = cur_count
         self.pbar.refresh()
 
-merged_user_id = {}
-
 def get_commit_stats_api(repo_owner, repo_name, sha):
     headers = {
-        'Authorization': f'token {config.github_token}',
         'User-Agent': 'request',
         'Accept': 'application/vnd.github.v3+json'
     }
@@ -42,13 +54,14 @@ def get_commit_stats_api(repo_owner, repo_name, sha):
         try:
             # Send a GET request to the commit data API endpoint
             response = get_with_timeout(
-                f'https://api.github.com/repos/{repo_owner}/{repo_name}/commits/{sha}',
+                f'{config.github_api_url}/repos/{repo_owner}/{repo_name}/commits/{sha}',
                 headers=headers,
-                params={'per_page': 100, 'page': page}
+                params={'per_page': 100, 'page': page},
+                immutable=True
             )
 
             if response is None:
-                print(f"An error occurred while fetching commit data for https://api.github.com/repos/{repo_owner}/{repo_name}/commits/{sha}")
+                print(f"An error occurred while fetching commit data for {config.github_api_url}/repos/{repo_owner}/{repo_name}/commits/{sha}")
                 break
             
             commit_data = response.json()
@@ -83,7 +96,7 @@ def get_commit_stats_api(repo_owner, repo_name, sha):
             else:
                 break
         except (requests.exceptions.RequestException, requests.exceptions.HTTPError) as e:
-            print(f"An error occurred while fetching commit data for https://api.github.com/repos/{repo_owner}/{repo_name}/commits/{sha}: {str(e)}")
+            print(f"An error occurred while fetching commit data for {config.github_api_url}/repos/{repo_owner}/{repo_name}/commits/{sha}: {str(e)}")
             break
 
     return file_stats
@@ -91,53 +104,53 @@ def get_commit_stats_api(repo_owner, repo_name, sha):
 def get_commit_stats(sha):
     file_stats = []
     try:
-        files = cur_repo.git.execute(['git', 'show' '', '--numstat', '--format=', f'{sha}'])
+        # Same git options and parsing as the 'log' engine, so both give the same file names
+        files = cur_repo.git.execute(['git', *GIT_OPTIONS, 'show', '--numstat', '--format=', f'{sha}'])
         commit_lines = str(files).splitlines()
         for i, line in enumerate(commit_lines):
-            line_segments = line.split('\t')
-            additions = int(line_segments[0])
-            deletions = int(line_segments[1])
-            file_name = line_segments[2]
-            file_stats.append((file_name, additions, deletions, additions + deletions))
+            file_stats.append(parse_numstat_line(line))
     except:
         #print(f'{repo_name}: Failed to locally retrieve commit stats for {sha}')
         return None
     return file_stats
 
-def get_release_dates(repo_owner, repo_name):
+def fetch_missing_releases(repo_owner, repo_name, release_cache, missing_tags):
     headers = {
-        'Authorization': f'token {config.github_token}',
         'User-Agent': 'request',
         'Accept': 'application/vnd.github.v3+json'
     }
 
-    releases_dates = {}
+    # Releases are listed newest first, so paging stops as soon as every missing tag was seen
+    missing_tags = set(missing_tags)
+    stop_early = bool(missing_tags)
+    complete = False
     page = 1
 
     while True:
         try:
             # Send a GET request to the releases API endpoint
             response = get_with_timeout(
-                f'https://api.github.com/repos/{repo_owner}/{repo_name}/releases',
+                f'{config.github_api_url}/repos/{repo_owner}/{repo_name}/releases',
                 headers=headers,
                 params={'per_page': 100, 'page': page}
             )
 
             # Check if the response was successful
-            if response and response.status_code == 200:
-                releases_data = response.json()
-
-                for release in releases_data:
-                    release_date = datetime.strptime(release['published_at'], "%Y-%m-%dT%H:%M:%SZ")
-                    release_tag = release['tag_name']
+            if not response or response.status_code != 200:
+                break
 
-                    rel_date = releases_dates.get(release_tag, None)
-                    if (rel_date != None):
-                        print(f"{release_tag} already exists!")
+            for release in response.json():
+                # Drafts have no publication date
+                if release['published_at'] is None:
+                    continue
+                release_cache.add(release['tag_name'], release['published_at'])
+                missing_tags.discard(release['tag_name'])
 
-                    releases_dates[release_tag] = release_date
+            if stop_early and not missing_tags:
+                complete = True
+                break
 
-            # Check if there are more commits to retrieve
+            # Check if there are more releases to retrieve
             if 'Link' in response.headers:
                 links = response.headers['Link'].split(', ')
                 try:
@@ -145,151 +158,224 @@ def get_release_dates(repo_owner, repo_name):
                     if next_link:
                         page += 1
                     else:
+                        complete = True
                         break
                 except StopIteration:
+                    complete = True
                     break
             else:
+                complete = True
                 break
         except (requests.exceptions.RequestException, requests.exceptions.HTTPError) as e:
-            print(f"An error occurred while fetching commit data for https://api.github.com/repos/{repo_owner}/{repo_name}/releases?per_page{100}&page={page}: {str(e)}")
+            print(f"An error occurred while fetching commit data for {config.github_api_url}/repos/{repo_owner}/{repo_name}/releases?per_page{100}&page={page}: {str(e)}")
             break
 
-    if (repo_get_tags is True):
-        page = 1
-        while True:
-            try:
-                # Send a GET request to the tags API endpoint
-                response = get_with_timeout(
-                    f'https://api.github.com/repos/{repo_owner}/{repo_name}/tags',
-                    headers=headers,
-                    params={'per_page': 100, 'page': page}
-                )
-
-                if response and response.status_code == 200:
-                    tags = response.json()
-
-                    for tag in tags:
-                        tag_name = tag['name']
-                        tag_commit_sha = tag['commit']['sha']
-
-                        rel_date = releases_dates.get(tag_name, None)
-                        if (rel_date != None):
-                            continue
-
-                        commit_response = get_with_timeout(
-                            f'https://api.github.com/repos/{repo_owner}/{repo_name}/commits/{tag_commit_sha}',
-                            headers=headers
-                        )
-
-                        if commit_response and commit_response.status_code == 200:
-                            commit_data = commit_response.json()
-                            commit_date_str = commit_data['commit']['committer']['date']
-                            commit_date = datetime.strptime(commit_date_str, '%Y-%m-%dT%H:%M:%SZ')
-                            releases_dates[tag_name] = commit_date
-
-                # Check if there are more commits to retrieve
-                if 'Link' in response.headers:
-                    links = response.headers['Link'].split(', ')
-                    try:
-                        next_link = next(link for link in links if 'rel="next"' in link)
-                        if next_link:
-                            page += 1
-                        else:
-                            break
-                    except StopIteration:
-                        break
-                else:
-                    break
-            except (requests.exceptions.RequestException, requests.exceptions.HTTPError) as e:
-                print(f"An error occurred while fetching commit data for https://api.github.com/repos/{repo_owner}/{repo_name}/commits?per_page{100}&page={page}: {str(e)}")
-                break
-    
+    # Only a full listing proves the remaining tags have no release
+    if complete:
+        for tag_name in missing_tags:
+            release_cache.add(tag_name, None)
+
+def get_release_dates(repo_owner, repo_name, repo_path, get_tags, release_cache_path):
+    # Tags and their commit dates come from the local clone in one pass,
+    # the API is only asked for the publication dates of releases missing from the cache
+    local_tags = read_local_tags(repo_path)
+    release_cache = ReleaseCache(release_cache_path)
+    missing_tags = release_cache.missing(local_tags)
+    if missing_tags or not release_cache.published_at:
+        print(f'{repo_name}: Fetching release dates for {len(missing_tags)} uncached tags...')
+        fetch_missing_releases(repo_owner, repo_name, release_cache, missing_tags)
+        release_cache.save()
+
+    releases_dates = release_cache.release_dates()
+    if get_tags is True:
+        # Tags without a published release are dated by the committer date of their commit
+        for tag_name, (_, commit_date) in local_tags.items():
+            releases_dates.setdefault(tag_name, commit_date)
+
     return releases_dates
 
-def get_merged_user_id(commit_author, merged_user_data):
-    user_id = merged_user_id.get((commit_author.name, commit_author.email), None)
-    if (user_id != None):
-        return user_id
-    
-    # Check to see if the email and name is contained.
-    for key in merged_user_data:
-        emails = merged_user_data[key]['emails']
-        names = merged_user_data[key]['names']
-
-        if (commit_author.name in names and commit_author.email in emails):
-            merged_user_id[(commit_author.name, commit_author.email)] = key
-            return key
-
-    # Fall back to name or email lookup
-    for key in merged_user_data:
-        emails = merged_user_data[key]['emails']
-        names = merged_user_data[key]['names']
-
-        if (commit_author.name in names or commit_author.email in emails):
-            merged_user_id[(commit_author.name, commit_author.email)] = key
-            return key
-
-    return -1
-
-def get_commit_list(repo, cutoff_date, release_dates, merged_user_data):
-    repo_commits = list(repo.iter_commits())
-    pbar = tqdm(total=len(repo_commits), position=0, leave=True, dynamic_ncols=True)
-    commit_list_network = {}
+def get_merged_user_id(commit_author, identity_index):
+    # Matches both name and email first, then falls back to name or email
+    return identity_index.lookup(commit_author.name, commit_author.email)
 
-    for i, commit in enumerate(repo_commits):
-        pbar.n = i
-        pbar.refresh()
+def iter_commit_stats(repo, cutoff_date, revs=('HEAD',), skip=0):
+    # Yield (sha, author, authored_date, commit_data) for every commit using the configured engine
+    if config.commit_stats_engine == 'log':
+        # Single streaming `git log --numstat` pass over the history
+        for commit_sha, author_name, author_email, authored_date, commit_data in iter_numstat(repo.working_dir, revs, skip):
+            yield commit_sha, git.Actor(author_name, author_email), authored_date, commit_data
+    else:
+        # Legacy path: one `git show --numstat` process per commit
+        for commit in repo.iter_commits(list(revs), skip=skip):
+            commit_sha = git.to_hex_sha(commit.binsha).decode("utf-8")
+            commit_data = None
+            if datetime.fromtimestamp(commit.authored_date) <= cutoff_date:
+                commit_data = get_commit_stats(commit_sha)
+            yield commit_sha, commit.author, commit.authored_date, commit_data
+
+def add_commit_to_cln(commit_list_network, merged_user_id, closest_release, author_name, author_email, commit_data):
+    for file in commit_data:
+        file_name = file[0]
+        file_additions = int(file[1])
+        file_deletions = int(file[2])
+        file_changes = int(file[3])
+        edge_key = (merged_user_id, file_name, closest_release)
+        edge_value = commit_list_network.get(edge_key, None)
+        if edge_value is not None:
+            file_additions += int(edge_value[2])
+            file_deletions += int(edge_value[3])
+            file_changes += int(edge_value[4])
+        commit_list_network[edge_key] = (author_name, author_email, file_additions, file_deletions, file_changes)
+
+def resolve_api_queue(commit_list_network, api_queue):
+    # Fetch the queued commits concurrently from the GitHub API and merge them into the aggregates
+    if not api_queue:
+        return
+    print(f'{repo_name}: Fetching {len(api_queue)} commits missing locally from the GitHub API...')
+    api_commit_data = fetch_commit_stats_concurrently(repo_owner, repo_name, [queued[0] for queued in api_queue])
+    # Commits missing pages are skipped rather than counted with partial stats, like a commit the
+    # sync path fails to fetch, so one commit the API can't serve doesn't stop the whole repository
+    failed_shas = [commit_sha for commit_sha, commit_data in api_commit_data.items() if commit_data is None]
+    if failed_shas:
+        print(f'{repo_name}: Failed to fetch {len(failed_shas)} commits from the GitHub API, skipping them: {", ".join(failed_shas)}')
+    for commit_sha, merged_user_id, closest_release, author_name, author_email in api_queue:
+        if api_commit_data[commit_sha] is None:
+            continue
+        add_commit_to_cln(commit_list_network, merged_user_id, closest_release, author_name, author_email, api_commit_data[commit_sha])
+    api_queue.clear()
+
+def get_commit_list(repo, cutoff_date, release_timeline, identity_index, bot_filter, bot_counts, commit_list_network=None, revs=('HEAD',), skip=0, checkpoint=None):
+    # New commits are merged into commit_list_network, and checkpoint is called every few thousand commits
+    # Commits by bot_filter's bots are skipped and counted per bot in bot_counts
+    commit_count = int(repo.git.rev_list('--count', *revs))
+    pbar = tqdm(total=commit_count, initial=skip, position=0, leave=True, dynamic_ncols=True)
+    if commit_list_network is None:
+        commit_list_network = {}
+    processed = skip
+    last_sha = None
+    api_queue = []
+
+    for commit_sha, commit_author, authored_date, commit_data in iter_commit_stats(repo, cutoff_date, revs, skip):
+        pbar.update(1)
+        # Checkpoint before touching this commit so the saved state only covers finished commits
+        if checkpoint is not None and processed > skip and processed % config.commit_list_checkpoint_interval == 0:
+            resolve_api_queue(commit_list_network, api_queue)
+            checkpoint(commit_list_network, processed, last_sha, False)
+        processed += 1
+        last_sha = commit_sha
 
         # If the commit was made after the cutoff date then skip it.
-        if datetime.fromtimestamp(commit.authored_date) > cutoff_date:
+        if datetime.fromtimestamp(authored_date) > cutoff_date:
             continue
 
-        commit_sha = git.to_hex_sha(commit.binsha).decode("utf-8")
+        # Skip this commit if it was made by a bot
+        bot_name = bot_filter.match_any((commit_author.name, commit_author.email))
+        if bot_name is not None:
+            bot_counts[bot_name] += 1
+            continue
 
-        # Try get commit data from local repository
-        commit_data = get_commit_stats(commit_sha)
+        # Uids are kept as strings so new commits merge with the ones loaded from the cache
+        merged_user_id = str(get_merged_user_id(commit_author, identity_index))
+        closest_release = get_closest_release(release_timeline, authored_date, commit_sha)
 
-        # Fall back to GitHub API if it fails
+        # Fall back to GitHub API if the local repository failed
         if commit_data is None:
+            if config.async_api_fallback:
+                # Queue the commit so the history walk doesn't wait on the network
+                api_queue.append((commit_sha, merged_user_id, closest_release, commit_author.name, commit_author.email))
+                continue
             commit_data = get_commit_stats_api(repo_owner, repo_name, commit_sha) #(file_name, additions, deletions, changes))
-        
-        # Skip this commit if it was made by a bot
-        bot_info = bot_dict.bot_dict[f'{repo_owner}/{repo_name}']
-        if commit.author.name in bot_info or commit.author.email in bot_info:
-            continue
 
-        merged_user_id = get_merged_user_id(commit.author, merged_user_data)
-        closest_release = get_closest_release(release_dates, commit)
-
-        for file in commit_data:
-            file_name = file[0]
-            file_additions = int(file[1])
-            file_deletions = int(file[2])
-            file_changes = int(file[3])
-            edge_key = (merged_user_id, file_name, closest_release)
-            edge_value = commit_list_network.get(edge_key, None)
-            if edge_value is not None:
-                file_additions += int(edge_value[2])
-                file_deletions += int(edge_value[3])
-                file_changes += int(edge_value[4])
-            commit_list_network[edge_key] = (commit.author.name, commit.author.email, file_additions, file_deletions, file_changes)
+        add_commit_to_cln(commit_list_network, merged_user_id, closest_release, commit_author.name, commit_author.email, commit_data)
 
     pbar.close()
     tqdm._instances.clear()
+    resolve_api_queue(commit_list_network, api_queue)
+    if checkpoint is not None:
+        checkpoint(commit_list_network, processed, last_sha, True)
     return commit_list_network
 
-def get_closest_release(release_dates, commit):
-    commit_timestamp = datetime.fromtimestamp(commit.authored_date)
-    closest_release = None
-    min_difference = timedelta.max
+def load_commit_list(commit_list_file_path):
+    commit_list_network = {}
+    if config.storage_format == 'csv':
+        with open(commit_list_file_path, 'r') as csv_file:
+            reader = csv.reader(csv_file)
+            for row in reader:
+                edge_key = (row[0], row[1], row[2])
+                commit_list_network[edge_key] = (row[4], row[5], row[6], row[7], row[8])
+    else:
+        # Columnar files keep uids typed, the in-memory keys use strings like the csv cache
+        for row in columnar.iter_rows(commit_list_file_path, config.storage_format):
+            edge_key = (str(row[0]), row[1], row[2])
+            commit_list_network[edge_key] = (row[4], row[5], row[6], row[7], row[8])
+    return commit_list_network
 
-    for release_tag, release_date in release_dates.items():
-        difference = release_date - commit_timestamp
-        if difference > timedelta() and difference < min_difference:
-            min_difference = difference
-            closest_release = release_tag
+def save_commit_list(commit_list_file_path, commit_list_network):
+    # Write to a temporary file first so a crash never leaves a truncated cache behind
+    tmp_file_path = commit_list_file_path + '.tmp'
 
-    return closest_release
+    def write_rows(write_row):
+        for i, commit in enumerate(commit_list_network):
+            write_row((int(commit[0]), commit[1], commit[2], releases_dates[commit[2]],
+                       commit_list_network[commit][0], 
+                       commit_list_network[commit][1], 
+                       int(commit_list_network[commit][2]), 
+                       int(commit_list_network[commit][3]), 
+                       int(commit_list_network[commit][4])))
+
+    try:
+        if config.storage_format == 'csv':
+            with open(tmp_file_path, 'w') as csv_file:
+                write_rows(csv.writer(csv_file).writerow)
+        else:
+            with columnar.TableWriter(tmp_file_path, columnar.COMMIT_LIST_SCHEMA, config.storage_format, config.row_group_size) as writer:
+                write_rows(writer.write_row)
+    except BaseException:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+        raise
+    os.replace(tmp_file_path, commit_list_file_path)
+
+def load_commit_list_state(state_file_path):
+    if not os.path.exists(state_file_path):
+        return None
+    with open(state_file_path, 'r') as json_file:
+        return json.load(json_file)
+
+def save_commit_list_state(state_file_path, state):
+    tmp_file_path = state_file_path + '.tmp'
+    with open(tmp_file_path, 'w') as json_file:
+        json.dump(state, json_file, indent=4)
+    os.replace(tmp_file_path, state_file_path)
+
+def update_commit_list(repo, cutoff_date, release_timeline, identity_index, bot_filter, bot_counts, commit_list_network, commit_list_file_path, state_file_path, target_sha, base_sha=None, skip=0):
+    # Walk the commits reachable from target_sha but not from base_sha, checkpointing the cache and the state as we go
+    revs = [target_sha] if base_sha is None else [target_sha, f'^{base_sha}']
+
+    def checkpoint(commit_list_network, processed, last_sha, complete):
+        save_commit_list(commit_list_file_path, commit_list_network)
+        save_commit_list_state(state_file_path, {
+            'head': target_sha if complete else base_sha,
+            'target': target_sha,
+            'base': base_sha,
+            'processed': processed,
+            'last_sha': last_sha,
+            'cutoff_date': cutoff_date.isoformat(),
+            'commit_list_file': os.path.basename(commit_list_file_path),
+            'complete': complete,
+        })
+
+    return get_commit_list(repo, cutoff_date, release_timeline, identity_index, bot_filter, bot_counts, commit_list_network, revs, skip, checkpoint)
+
+def get_closest_release(release_timeline, authored_date, commit_sha=None):
+    # Binary search for the first release published after the commit,
+    # or the first release containing it when releases were assigned by ancestry
+    return release_timeline.next_release(authored_date, commit_sha)
+
+def open_edge_writer(file_stem, fields, schema):
+    # Open the configured storage backend for an edge list
+    return open_edge_sink(data_folder, file_stem, fields, schema, config.storage_format,
+                          config.edge_compression, config.edge_write_buffer_size, config.row_group_size)
 
 def sort_cln_by_file(commit_list_network):
     sorted_cln = {}
@@ -314,27 +400,15 @@ def sort_cln_by_file(commit_list_network):
     return sorted_cln
 
 def write_longitudinal_network_cln_to_file(final_cln):
-    # CSV file
-    commit_data_file = f"{repo_name}_longitudinal_commit_network.csv"
-    commit_data_path = os.path.join(data_folder, commit_data_file)
-
     fields = ['source-uid', 'source-name', 'source-email', 'target-uid', 'target-name', 'target-email', 'release', 'release-date', 'loc-added', 'loc-deleted', 'loc-changed']
-    
-    # If the file doesn't exist, create a new file
-    if not os.path.exists(commit_data_path):
-        with open(commit_data_path, 'w') as file:
-            writer = csv.writer(file)
-            writer.writerow(fields)
-
-    # Write to csv file
+
+    # Write to file
     print(f'{repo_name}: Saving longitudinal commit list network edge to file...')
-    pbar = tqdm(total=len(final_cln), position=0, leave=True, dynamic_ncols=True)
-    pbar.n = 0
-    with open(commit_data_path, 'a') as file:
-        writer = csv.writer(file)
+    pbar = ThrottledProgress(total=len(final_cln))
+    writer = open_edge_writer(f"{repo_name}_longitudinal_commit_network", fields, LONGITUDINAL_SCHEMA)
+    try:
         for i, cln_key in enumerate(final_cln):
-            pbar.n = i + 1
-            pbar.refresh()
+            pbar.update()
             source_uid = cln_key[0]
             target_uid = cln_key[1]
             source_release = cln_key[2]
@@ -346,80 +420,43 @@ def write_longitudinal_network_cln_to_file(final_cln):
             loc_added = int(final_cln[cln_key][4])
             loc_deleted = int(final_cln[cln_key][5])
             loc_changed = int(final_cln[cln_key][6])
-            writer.writerow((source_uid, source_aname, source_aemail, target_uid, target_aname, target_aemail, source_release, releases_dates[source_release], loc_added, loc_deleted, loc_changed))
+            writer.write_row((int(source_uid), source_aname, source_aemail, int(target_uid), target_aname, target_aemail, source_release, releases_dates[source_release], loc_added, loc_deleted, loc_changed))
+    finally:
+        writer.close()
     pbar.close()
-    tqdm._instances.clear()
 
 def create_bipartite_network_cln(repo_name, data_folder, final_cln, write_bipartite_cln_to_file):
-    # CSV file
-    commit_data_file = f"{repo_name}_commit_network.csv"
-    commit_data_path = os.path.join(data_folder, commit_data_file)
-
     flattened_cln = {}
 
-    # Write to csv file
+    # Only open the bipartite edge list when it is requested
+    writer = None
     if write_bipartite_cln_to_file:
         print(f'{repo_name}: Saving commit list network edge to file...')
 
         fields = ['source-uid', 'source-name', 'source-email', 'target-uid', 'target-name', 'target-email', 'filepath', 'release', 'release-date', 'loc-added', 'loc-deleted', 'loc-changed']
-    
-        # If the file doesn't exist, create a new file
-        if not os.path.exists(commit_data_path):
-            with open(commit_data_path, 'w') as file:
-                writer = csv.writer(file)
-                writer.writerow(fields)
+        writer = open_edge_writer(f"{repo_name}_commit_network", fields, BIPARTITE_SCHEMA)
     else:
         print(f'{repo_name}: Generating commit list network edge to file...')
 
-    pbar = tqdm(total=len(final_cln), position=0, leave=True, dynamic_ncols=True)
-    pbar.n = 0
-    with open(commit_data_path, 'a') as file:
-        if write_bipartite_cln_to_file:
-            writer = csv.writer(file)
+    pbar = ThrottledProgress(total=len(final_cln))
+    try:
         for i, cln_file in enumerate(final_cln):
-            pbar.n = i + 1
-            pbar.refresh()
-            for source_point in final_cln[cln_file]:
-                source_uid = source_point[0]
-                source_release = source_point[1]
-                source_aname = source_point[2]
-                source_aemail = source_point[3]
-                for target_point in final_cln[cln_file]:
-                    target_uid = target_point[0]
-                    target_release = target_point[1]
-                    if (source_release == target_release) and (source_uid != target_uid):
-                        target_aname = target_point[2]
-                        target_aemail = target_point[3]
-                        loc_added = int(source_point[4])
-                        loc_deleted = int(source_point[5])
-                        loc_changed = int(source_point[6])
-
-                        if write_bipartite_cln_to_file:
-                            writer.writerow((source_uid, source_aname, source_aemail, target_uid, target_aname, target_aemail, cln_file, source_release, releases_dates[source_release], loc_added, loc_deleted, loc_changed))
-                        
-                        flattened_cln_key = (source_uid, target_uid, source_release)
-                        flattened_cln_value = flattened_cln.get(flattened_cln_key, None)
-                        if (flattened_cln_value is None):
-                            flattened_cln[flattened_cln_key] = (source_aname, source_aemail, target_aname, target_aemail, loc_added, loc_deleted, loc_changed)
-                        else:
-                            flattened_cln[flattened_cln_key] = (source_aname, source_aemail, target_aname, target_aemail, 
-                                                                int(flattened_cln_value[4]) + loc_added, 
-                                                                int(flattened_cln_value[5]) + loc_deleted, 
-                                                                int(flattened_cln_value[6]) + loc_changed)
-    
-    # Cleanup left over file
-    if write_bipartite_cln_to_file is False:
-        os.remove(commit_data_path)
+            pbar.update()
+            on_edge = None
+            if writer is not None:
+                def on_edge(source_point, target_point):
+                    writer.write_row((int(source_point[0]), source_point[2], source_point[3], int(target_point[0]), target_point[2], target_point[3],
+                                      cln_file, source_point[1], releases_dates[source_point[1]],
+                                      int(source_point[4]), int(source_point[5]), int(source_point[6])))
+            add_file_edges(flattened_cln, final_cln[cln_file], on_edge)
+    finally:
+        if writer is not None:
+            writer.close()
 
     pbar.close()
-    tqdm._instances.clear()
     return flattened_cln
 
 def create_static_cln(final_cln):
-    # CSV file
-    commit_data_file = f"{repo_name}_static_commit_network.csv"
-    commit_data_path = os.path.join(data_folder, commit_data_file)
-
     final_static_cln = {}
     for i, cln_key in enumerate(final_cln):
         source_uid = cln_key[0]
@@ -443,22 +480,14 @@ def create_static_cln(final_cln):
                                                 int(static_cln_value[6]) + loc_changed)
 
     fields = ['source-uid', 'source-name', 'source-email', 'target-uid', 'target-name', 'target-email', 'loc-added', 'loc-deleted', 'loc-changed']
-    
-    # If the file doesn't exist, create a new file
-    if not os.path.exists(commit_data_path):
-        with open(commit_data_path, 'w') as file:
-            writer = csv.writer(file)
-            writer.writerow(fields)
-
-    # Write to csv file
+
+    # Write to file
     print(f'{repo_name}: Saving static commit list network edge to file...')
-    pbar = tqdm(total=len(final_static_cln), position=0, leave=True, dynamic_ncols=True)
-    pbar.n = 0
-    with open(commit_data_path, 'a') as file:
-        writer = csv.writer(file)
+    pbar = ThrottledProgress(total=len(final_static_cln))
+    writer = open_edge_writer(f"{repo_name}_static_commit_network", fields, STATIC_SCHEMA)
+    try:
         for i, cln_key in enumerate(final_static_cln):
-            pbar.n = i + 1
-            pbar.refresh()
+            pbar.update()
             source_uid = cln_key[0]
             target_uid = cln_key[1]
             
@@ -469,84 +498,126 @@ def create_static_cln(final_cln):
             loc_added = int(final_static_cln[cln_key][4])
             loc_deleted = int(final_static_cln[cln_key][5])
             loc_changed = int(final_static_cln[cln_key][6])
-            writer.writerow((source_uid, source_aname, source_aemail, target_uid, target_aname, target_aemail, loc_added, loc_deleted, loc_changed))
+            writer.write_row((int(source_uid), source_aname, source_aemail, int(target_uid), target_aname, target_aemail, loc_added, loc_deleted, loc_changed))
+    finally:
+        writer.close()
     pbar.close()
-    tqdm._instances.clear()
 
 # Create the 'Data' folder if it doesn't exist
 data_folder = 'Data/Network'
 repo_folder = 'Data/Repo'
 merged_users_folder = 'Data/Merged_Users'
 commit_list_folder = cur_repo_folder = os.path.join(data_folder, 'Commits')
+release_cache_folder = os.path.join(data_folder, 'Releases')
+
+# Guarded so worker processes started with spawn (config.edge_workers > 1) can import this script
+if __name__ == '__main__':
+    os.makedirs(data_folder, exist_ok=True)
+
+    # Iterate over the repositories and collect commit data
+    for repo in config.repo_list:
+        # Specify parameters
+        repo_name = repo['name']
+        repo_owner = repo['owner']
+        repo_get_tags = repo['get_tags']
+        cutoff_date = datetime(2022, 9, 12)
+
+        cur_repo_folder = os.path.join(repo_folder, repo_name)
+        print(f'{repo_name}: Looking for repository...')
+        if not os.path.exists(cur_repo_folder):
+            print(f'{repo_name}: Failed to find repository, cloning repository...')
+            clone_repo(f'https://github.com/{repo_owner}/{repo_name}.git', cur_repo_folder, repo, progress=CloneProgress())
+            tqdm._instances.clear()
+
+        cur_repo = git.Repo(cur_repo_folder)
+        print(f'{repo_name}: Finished setting up local repository')
+
+        # Get the release dates for the repository
+        print(f'{repo_name}: Fetching releases...')
+        releases_dates = get_release_dates(repo_owner, repo_name, cur_repo_folder, repo_get_tags,
+                                           os.path.join(release_cache_folder, f'{repo_name}_releases.json'))
+        print(f'{repo_name}: {len(releases_dates)} releases')
+        release_timeline = ReleaseTimeline(releases_dates)
+        if config.release_assignment == 'ancestry':
+            print(f'{repo_name}: Assigning commits to releases by ancestry...')
+            tag_shas = {tag_name: sha for tag_name, (sha, _) in read_local_tags(cur_repo_folder).items()}
+            release_timeline.assign_by_ancestry(cur_repo_folder, tag_shas)
+
+        # Load the merged user data
+        with open(f'{merged_users_folder}/{repo_name}.json', 'r') as json_file:
+            merged_user_data = json.load(json_file)
+        identity_index = IdentityIndex(merged_user_data)
+
+        # Compile the repository's bots once, get_commit_list drops their commits and counts them per bot
+        bot_filter = BotFilter.for_repo(f'{repo_owner}/{repo_name}')
+        bot_counts = Counter()
+
+        # Get the commit list for the repository
+        os.makedirs(commit_list_folder, exist_ok=True)
+        print(f'{repo_name}: Looking for saved commits...')
+        commit_list_file_path = os.path.join(commit_list_folder, f'{repo_name}_commit_list' + STORAGE_EXTENSIONS[config.storage_format])
+        commit_list_state_path = os.path.join(commit_list_folder, f'{repo_name}_commit_list_state.json')
+        commit_list_network = {}
+        if os.path.exists(commit_list_file_path):
+            print(f'{repo_name}: Loading saved commits...')
+            commit_list_network = load_commit_list(commit_list_file_path)
+
+        commit_list_state = load_commit_list_state(commit_list_state_path)
+        if commit_list_state is not None and commit_list_state.get('cutoff_date', None) != cutoff_date.isoformat():
+            # The saved commits were collected with another cutoff date, they can't be extended
+            print(f'{repo_name}: Saved commits use cutoff date {commit_list_state.get("cutoff_date", None)}, retrieving commits again...')
+            commit_list_network = {}
+            commit_list_state = None
+        elif commit_list_state is not None and (not os.path.exists(commit_list_file_path) or
+                                                commit_list_state.get('commit_list_file', None) != os.path.basename(commit_list_file_path)):
+            # The state describes another cache file (deleted, or written in another storage_format), so it covers nothing
+            print(f'{repo_name}: Saved commits state is not for {os.path.basename(commit_list_file_path)}, retrieving commits again...')
+            commit_list_network = {}
+            commit_list_state = None
+        if commit_list_state is None and commit_list_network:
+            # Caches written before checkpointing existed don't record what they cover
+            print(f'{repo_name}: Saved commits have no checkpoint, reusing them as they are...')
+        else:
+            head_sha = cur_repo.head.commit.hexsha
+            if commit_list_state is None:
+                print(f'{repo_name}: Failed to find saved commits, retrieving commits...')
+                commit_list_state = {'head': None, 'complete': True}
+            if not commit_list_state['complete']:
+                print(f'{repo_name}: Resuming from checkpoint after {commit_list_state["processed"]} commits...')
+                commit_list_network = update_commit_list(cur_repo, cutoff_date, release_timeline, identity_index, bot_filter, bot_counts, commit_list_network,
+                                                         commit_list_file_path, commit_list_state_path,
+                                                         commit_list_state['target'], commit_list_state['base'], commit_list_state['processed'])
+                commit_list_state = load_commit_list_state(commit_list_state_path)
+            if commit_list_state['head'] != head_sha:
+                if commit_list_state['head'] is not None:
+                    print(f'{repo_name}: Retrieving commits made since {commit_list_state["head"]}...')
+                commit_list_network = update_commit_list(cur_repo, cutoff_date, release_timeline, identity_index, bot_filter, bot_counts, commit_list_network,
+                                                         commit_list_file_path, commit_list_state_path,
+                                                         head_sha, commit_list_state['head'])
+        if bot_counts:
+            print(f'{repo_name}: Dropped {sum(bot_counts.values())} bot commits: {dict(bot_counts.most_common())}')
+
+        write_bipartite_cln_to_file = config.write_bipartite_cln_to_file
+        if config.edge_workers > 1 and not write_bipartite_cln_to_file:
+            # Build each release's edges in its own worker process
+            print(f'{repo_name}: Generating commit list network edges with {config.edge_workers} workers...')
+            longitudinal_cln = create_network_cln_sharded(commit_list_network, config.edge_engine, config.edge_workers)
+        elif config.edge_engine == 'sparse' and not write_bipartite_cln_to_file:
+            # Project the per-release user x file matrices onto user -> user edges
+            print(f'{repo_name}: Generating commit list network edges with sparse matrices...')
+            longitudinal_cln = create_network_cln_sparse(commit_list_network)
+        else:
+            # Sort the CLN by file path to improve network edge list creation efficiency
+            print(f'{repo_name}: Sorting commits by file...')
+            sorted_cln = sort_cln_by_file(commit_list_network)
 
-os.makedirs(data_folder, exist_ok=True)
-
-# Iterate over the repositories and collect commit data
-for repo in config.repo_list:
-    # Specify parameters
-    repo_name = repo['name']
-    repo_owner = repo['owner']
-    repo_get_tags = repo['get_tags']
-    cutoff_date = datetime(2022, 9, 12)
-
-    cur_repo_folder = os.path.join(repo_folder, repo_name)
-    print(f'{repo_name}: Looking for repository...')
-    if not os.path.exists(cur_repo_folder):
-        print(f'{repo_name}: Failed to find repository, cloning repository...')
-        git.Repo.clone_from(f'https://github.com/{repo_owner}/{repo_name}.git', cur_repo_folder, progress=CloneProgress())
-        tqdm._instances.clear()
-
-    cur_repo = git.Repo(cur_repo_folder)
-    print(f'{repo_name}: Finished setting up local repository')
-
-    # Get the release dates for the repository
-    print(f'{repo_name}: Fetching releases...')
-    releases_dates = get_release_dates(repo_owner, repo_name)
-    print(f'{repo_name}: {len(releases_dates)} releases')
-
-    # Load the merged user data
-    with open(f'{merged_users_folder}/{repo_name}.json', 'r') as json_file:
-        merged_user_data = json.load(json_file)
-
-    # Get the commit list for the repository
-    os.makedirs(commit_list_folder, exist_ok=True)
-    print(f'{repo_name}: Looking for saved commits...')
-    commit_list_file_path = os.path.join(commit_list_folder, f'{repo_name}_commit_list.csv')
-    commit_list_network = {}
-    if not os.path.exists(commit_list_file_path):
-        print(f'{repo_name}: Failed to find saved commits, retrieving commits...')
-        commit_list_network = get_commit_list(cur_repo, cutoff_date, releases_dates, merged_user_data)
-
-        print(f'{repo_name}: Savings commits...')
-        with open(commit_list_file_path, 'w') as csv_file:
-            writer = csv.writer(csv_file)
-            for i, commit in enumerate(commit_list_network):
-                writer.writerow((commit[0], commit[1], commit[2], releases_dates[commit[2]],
-                                commit_list_network[commit][0], 
-                                commit_list_network[commit][1], 
-                                commit_list_network[commit][2], 
-                                commit_list_network[commit][3], 
-                                commit_list_network[commit][4]))
-    else:
-        print(f'{repo_name}: Loading saved commits...')
-        with open(commit_list_file_path, 'r') as csv_file:
-            reader = csv.reader(csv_file)
-            for row in reader:
-                edge_key = (row[0], row[1], row[2])
-                commit_list_network[edge_key] = (row[4], row[5], row[6], row[7], row[8])
-
-    # Sort the CLN by file path to improve network edge list creation efficiency
-    print(f'{repo_name}: Sorting commits by file...')
-    sorted_cln = sort_cln_by_file(commit_list_network)
-    
-    # Make the bipartite cln
-    write_bipartite_cln_to_file = False
-    longitudinal_cln = create_bipartite_network_cln(repo_name, data_folder, sorted_cln, write_bipartite_cln_to_file)
+            # Make the bipartite cln
+            longitudinal_cln = create_bipartite_network_cln(repo_name, data_folder, sorted_cln, write_bipartite_cln_to_file)
 
-    # Write to file
-    write_longitudinal_network_cln_to_file(longitudinal_cln)
+        # Write to file
+        write_longitudinal_network_cln_to_file(longitudinal_cln)
 
-    # Create and write static cln
-    create_static_cln(longitudinal_cln)
+        # Create and write static cln
+        create_static_cln(longitudinal_cln)
 
-    print(f'{repo_name}: Done!')
\ No newline at end of file
+        print(f'{repo_name}: Done!')
\ No newline at end of file
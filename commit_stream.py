@@ -0,0 +1,83 @@
+import os
+from collections import Counter
+import pandas as pd
+
+# Chunked streaming over the commit csv files of bots_dropping.py and uid_annotating.py.
+# Commits are read in fixed-size chunks and passed through generator stages, so memory stays
+# bounded by the chunk size whatever the size of the repository. The stages can be chained,
+# e.g. drop_bots() then annotate_uids(), to run both scripts in a single pass over the data.
+
+CHUNK_SIZE = int(os.environ.get('COMMIT_CHUNK_SIZE', 50000))
+
+def read_commit_chunks(path, chunksize=CHUNK_SIZE):
+    """Yield the commits of a csv file as DataFrames of at most chunksize rows.
+
+    Every field is read as a string and empty fields stay '', like csv.DictReader.
+    """
+    with pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False, encoding='utf-8') as reader:
+        yield from reader
+
+def match_commit_bots(chunk, bot_filter):
+    """Return the bot of every commit of a chunk, NaN for the other commits.
+
+    Bots are matched in the login, or in the author name when the login is blank.
+    """
+    blank_login = chunk['Login Name'] == ''
+    bot_names = bot_filter.match_series(chunk['Login Name'], substring=True)
+    return bot_names.fillna('BLANK_LOGIN_WITH_AUTHOR:' + bot_filter.match_series(chunk['Author Name'].where(blank_login), substring=True))
+
+def summarize_committers(chunks, committers):
+    """Pass the chunks through, counting the commits of each committer in committers.
+
+    committers maps a committer name to {'commit_num': ..., 'email_add': ...}, the email of its first commit.
+    """
+    for chunk in chunks:
+        _counts = chunk.groupby('Committer Name', sort=False)['Committer Email'].agg(['size', 'first'])
+        for committer_name, commit_num, email_add in _counts.itertuples():
+            if committer_name in committers:
+                committers[committer_name]['commit_num'] += int(commit_num)
+            else:
+                committers[committer_name] = {'commit_num': int(commit_num), 'email_add': email_add}
+        yield chunk
+
+def drop_bots(chunks, bot_filter, dropped_names=None, author_names=None):
+    """Drop the bot commits from each chunk, counting them per bot in dropped_names.
+
+    The commits left are counted per author name in author_names.
+    """
+    if dropped_names is None:
+        dropped_names = Counter()
+    if author_names is None:
+        author_names = Counter()
+    for chunk in chunks:
+        bot_names = match_commit_bots(chunk, bot_filter)
+        is_bot = bot_names.notna()
+        dropped_names.update(bot_names[is_bot])
+        chunk = chunk[~is_bot]
+        author_names.update(chunk['Author Name'])
+        yield chunk
+
+def annotate_uids(chunks, identity_index):
+    """Add the 'Author Id' column to each chunk, the uid of the author name or -1."""
+    for chunk in chunks:
+        chunk = chunk.copy()
+        chunk['Author Id'] = chunk['Author Name'].map(identity_index.name_to_uid).fillna(-1)
+        yield chunk
+
+def write_chunks(chunks, path):
+    """Append the chunks to a csv file written in place of path once complete, and return the row count."""
+    tmp_path = path + '.tmp'
+    row_count = 0
+    header = True
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            for chunk in chunks:
+                chunk.to_csv(f, index=False, header=header)
+                header = False
+                row_count += len(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return row_count
@@ -4,11 +4,15 @@
 # We tried author_email but too many commits are not associated with an email :(
 
 import os
+import threading
 import github
 import logging
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
 import pandas as pd
 from tqdm.auto import tqdm
 from multiprocess import Pool
+from token_scheduler import TokenScheduler
 
 PROJECTS = [
     'huggingface/transformers',
@@ -22,20 +26,98 @@ if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
 def _build_client_pool(tokens: list[str]):
-    """Create a GitHub client pool to walkaround the rate limit."""
-    _client_pool = []
+    """Create a GitHub client per valid token, keyed by token."""
+    _client_pool = {}
     for t in tokens:
         auth = github.Auth.Token(t)
         gh = github.Github(auth=auth)
         try:
             print(gh.get_user().login, "*" * (len(t) - 5) + t[-5:])
-            _client_pool.append(gh)
+            _client_pool[t] = gh
         except github.BadCredentialsException as e:
             print("Bad token", "*" * (len(t) - 5) + t[-5:], e)
             continue
     return _client_pool
 
-client_pool = _build_client_pool(GITHUB_TOKENS)
+class ScheduledToken(github.Auth.Auth):
+    """Authenticate every request with the token the scheduler picks, remembered per thread for its response."""
+
+    def __init__(self, scheduler: TokenScheduler):
+        self.scheduler = scheduler
+        self.local = threading.local()
+
+    @property
+    def token_type(self) -> str:
+        return "token"
+
+    @property
+    def token(self) -> str:
+        self.local.token = self.scheduler.acquire()
+        return self.local.token
+
+    @property
+    def current_token(self):
+        return getattr(self.local, 'token', None)
+
+class _ExceptionResponse:
+    """The parts of a requests.Response read by TokenScheduler, taken from a GithubException."""
+
+    def __init__(self, e: github.GithubException):
+        self.status_code = e.status
+        self.headers = CaseInsensitiveDict(e.headers or {})
+        self.data = e.data
+
+    def json(self):
+        if not isinstance(self.data, dict):
+            raise ValueError("No json body")
+        return self.data
+
+def _build_scheduled_client(scheduler: TokenScheduler):
+    """Create a GitHub client whose every request goes through the scheduler.
+
+    Each request uses the token with the most headroom, the rate limit headers of the response are
+    fed back to the scheduler, and a rate limited request parks its token (Retry-After, primary
+    reset or exponential backoff) and is retried with another one.
+    """
+    auth = ScheduledToken(scheduler)
+    # Only retry server errors in urllib3, rate limits are handled here by switching tokens
+    gh = github.Github(auth=auth, retry=Retry(total=3, backoff_factor=1, status_forcelist=(500, 502, 503, 504)))
+    request_json_and_check = gh.requester.requestJsonAndCheck
+
+    def scheduled_request_json_and_check(*args, **kwargs):
+        while True:
+            try:
+                headers, data = request_json_and_check(*args, **kwargs)
+            except github.GithubException as e:
+                response = _ExceptionResponse(e)
+                scheduler.update(auth.current_token, response.headers)
+                if scheduler.is_rate_limited(response):
+                    scheduler.backoff(auth.current_token, response)
+                    continue
+                raise
+            scheduler.update(auth.current_token, CaseInsensitiveDict(headers))
+            return headers, data
+
+    gh.requester.requestJsonAndCheck = scheduled_request_json_and_check
+    return gh
+
+client_by_token = _build_client_pool(GITHUB_TOKENS)
+if not client_by_token:
+    raise ValueError("No valid GitHub token in GITHUB_TOKENS")
+scheduler = TokenScheduler(client_by_token)
+
+def _refresh_rate_limits():
+    """Seed the scheduler with the current quota of every token."""
+    for token, gh in client_by_token.items():
+        remaining, _ = gh.rate_limiting
+        scheduler.update(token, {
+            'X-RateLimit-Remaining': remaining,
+            'X-RateLimit-Reset': int(gh.rate_limiting_resettime),
+        })
+
+_refresh_rate_limits()
+# Worker processes get a copy of the scheduler, the headers of their own responses keep it up to date
+gh = _build_scheduled_client(scheduler)
 
 ### 1. Get releases ###
 
@@ -68,7 +150,7 @@ def get_repo_releases_worker(
 
 with Pool(10) as p:
     for _ in tqdm(p.imap_unordered(
-            lambda i: get_repo_releases_worker(client_pool[i % len(client_pool)], PROJECTS[i]), 
+            lambda i: get_repo_releases_worker(gh, PROJECTS[i]), 
                 range(len(PROJECTS)))
             , total=len(PROJECTS)):
         pass
@@ -122,7 +204,7 @@ def get_repo_commits_worker(
 
 with Pool(10) as p:
     for _ in tqdm(p.imap_unordered(
-            lambda i: get_repo_commits_worker(client_pool[i % len(client_pool)], PROJECTS[i]), 
+            lambda i: get_repo_commits_worker(gh, PROJECTS[i]), 
                 range(len(PROJECTS)))
             , total=len(PROJECTS)):
         pass
@@ -15,6 +15,15 @@ from datetime import datetime, tzinfo
 import pytz
 import pydriller
 import json
+import time
+from collections import Counter
+from datetime import timezone
+import pyarrow as pa
+from columnar import TableWriter, iter_batches, GIT_COMMITS_SCHEMA, GIT_FILE_STATS_SCHEMA
+from git_log import iter_numstat, list_merges, resolve_rename, get_committer_date_range
+from cloning import clone_repo, get_repo_entry
+from email_domains import is_corporate_domain
+from bot_filter import BotFilter
 
 # the list of projects to analyze
 PROJECTS = [
@@ -30,7 +39,9 @@ def clone_repository(
     base_path: str = 'repo',
     if_exists: Literal['overwrite', 'update', 'ignore'] = 'ignore',
 ):
-    """Clone a Git repository to a local directory."""
+    """Clone a Git repository to a local directory.
+    The clone mode (full, blobless, shallow or mirror) comes from the repo's entry in config.repo_list.
+    """
     if not os.path.exists(base_path):
         os.makedirs(base_path)
     _dest_path = os.path.join(base_path, name_with_owner.replace("/", "_"))
@@ -45,7 +56,8 @@ def clone_repository(
         else:
             return _dest_path
     
-    repo = git.Repo.clone_from(f"git@github.com:{name_with_owner}.git", _dest_path)
+    _owner, _name = name_with_owner.split("/")
+    repo = clone_repo(f"git@github.com:{name_with_owner}.git", _dest_path, get_repo_entry(_owner, _name))
     return _dest_path
 
 with Pool(len(PROJECTS)) as pool:
@@ -57,38 +69,14 @@ with Pool(len(PROJECTS)) as pool:
 # pytorch's donation to linux foundation
 CUTOFF_DATE = datetime(2022, 9, 12, tzinfo=pytz.UTC)
 
-# the most exhaustive list of email domains
-# https://gist.github.com/ammarshah/f5c2624d767f91a7cbdc4e54db8dd0bf
-with open('public_email_domains.txt', 'r') as f:
-    PUBLIC_EMAIL_DOMAINS = set(f.read().splitlines())
-    PUBLIC_EMAIL_DOMAINS.add('users.noreply.github.com')
-
-def is_corporate_domain(domain: str | None):
-    """Check if a email address is corporate email."""
-    if domain in PUBLIC_EMAIL_DOMAINS or domain is None:
-        return False
-    # it's very hard to tell if a domain is corporate or not,
-    # e.g. .com .co .ai .io .com.* .co.*
-    for pat in '.com', '.io', '.ai', '.co':
-        if pat in domain:
-            return True
-    return False
-
 def get_file_stats(commit: pydriller.Commit):
-    """Calculate the number of lines added, deleted, and modified to a file."""
-    _res = {}
-    for f in commit.modified_files:
-        _res[f.new_path] = {
-            "add": f.added_lines,
-            "del": f.deleted_lines,
-            "sum": f.added_lines + f.deleted_lines,
-        }
-    return _res
-
-def count_commits(repo_path):
-    """Count the number of commits in a Git repository."""
+    """Calculate the number of lines added and deleted to each file, as (path, add, del) rows."""
+    return [(f.new_path, f.added_lines, f.deleted_lines) for f in commit.modified_files]
+
+def list_commits(repo_path: str, cutoff_date: datetime):
+    """List the commits up to the cutoff date, oldest first, in the order the commit sources walk them."""
     repo = git.Repo(repo_path)
-    return int(repo.git.rev_list('--all', '--count'))
+    return repo.git.rev_list('--reverse', f'--until={cutoff_date.isoformat()}', 'HEAD').split()
 
 def update_author_aff(author: str, email: str, aff_dict: dict[str, str | None]):
     """Get and update the author's affiliation.
@@ -102,39 +90,133 @@ def update_author_aff(author: str, email: str, aff_dict: dict[str, str | None]):
         aff_dict[author.lower()] = _aff
         return _aff
 
-def build_commits_dataset(
+def iter_commits_pydriller(repo_path: str, cutoff_date: datetime, shas: list[str] | None = None):
+    """Yield (sha, date, name, email, file_stats, add, del, sum) per commit, oldest first, with pydriller.
+    Only the given shas are yielded when a shard of the history is passed. pydriller applies
+    only_commits after building every commit it walks, so git first narrows the walk down to the
+    committer date range of the shard (--since-as-filter, unlike --since, doesn't stop at clock skew).
+    """
+    if shas is None:
+        repo = pydriller.Repository(repo_path, to=cutoff_date)
+    else:
+        _since, _until = get_committer_date_range(repo_path, shas)
+        repo = pydriller.Repository(repo_path, since_as_filter=datetime.fromtimestamp(_since, timezone.utc),
+                                    to=datetime.fromtimestamp(_until, timezone.utc), only_commits=shas)
+    for cmt in repo.traverse_commits():
+        yield (cmt.hash, cmt.author_date, cmt.author.name, cmt.author.email,
+               get_file_stats(cmt), cmt.insertions, cmt.deletions, cmt.lines)
+
+def iter_commits_git_log(repo_path: str, cutoff_date: datetime, shas: list[str] | None = None):
+    """Yield the same rows as iter_commits_pydriller from a single `git log --numstat` stream.
+    No diff objects are built. Like in pydriller, binary files count as 0 lines, deleted files have
+    None as their path, and merge commits have no file stats but totals against their first parent.
+    """
+    _options = dict(combined_merges=False, binary_as_zero=True, first_parent_merges=True, deletions_as_none=True)
+    if shas is None:
+        _merges = list_merges(repo_path)
+        _commits = iter_numstat(repo_path, reverse=True, until=cutoff_date, **_options)
+    else:
+        _merges = list_merges(repo_path, shas, no_walk=True)
+        _commits = iter_numstat(repo_path, shas, no_walk=True, **_options)
+    for sha, name, email, authored_date, file_stats in _commits:
+        _file_stats = [(None if _path is None else resolve_rename(_path), _add, _del) for _path, _add, _del, _ in file_stats]
+        _add = sum(f[1] for f in _file_stats)
+        _del = sum(f[2] for f in _file_stats)
+        if sha in _merges:
+            _file_stats = []
+        yield (sha, datetime.fromtimestamp(authored_date, timezone.utc), name, email,
+               _file_stats, _add, _del, _add + _del)
+
+# the commit source is selectable per run, e.g. COMMIT_SOURCE=git_log
+COMMIT_SOURCES = {
+    'pydriller': iter_commits_pydriller,
+    'git_log': iter_commits_git_log,
+}
+COMMIT_SOURCE = os.environ.get('COMMIT_SOURCE', 'pydriller')
+
+def benchmark_commit_sources(repo_path: str, cutoff_date: datetime, limit: int = 2000):
+    """Report the throughput of every commit source over the first `limit` commits."""
+    for _source, _iter_commits in COMMIT_SOURCES.items():
+        _start = time.perf_counter()
+        _cnt = 0
+        for _ in _iter_commits(repo_path, cutoff_date):
+            _cnt += 1
+            if _cnt >= limit:
+                break
+        _elapsed = time.perf_counter() - _start
+        print(f"{repo_path}: {_source} read {_cnt} commits in {_elapsed:.1f}s ({_cnt / max(_elapsed, 1e-9):.0f} commits/s)")
+
+# commits are buffered per column and written out every CHUNK_SIZE rows
+CHUNK_SIZE = 10000
+# the history of every repo is split into shards of SHARD_SIZE commits processed in parallel
+SHARD_SIZE = int(os.environ.get('SHARD_SIZE', 5000))
+N_WORKERS = int(os.environ.get('N_WORKERS', os.cpu_count()))
+
+def get_shard_prefix(name_with_owner: str, output_path: str, shard_idx: int):
+    return os.path.join(output_path, f'{name_with_owner.replace("/", "_")}.shard{shard_idx:05d}')
+
+def shard_commits(name_with_owner: str, base_path: str, cutoff_date: datetime, shard_size: int = SHARD_SIZE):
+    """Split the history into contiguous shards of commits, oldest first."""
+    _shas = list_commits(os.path.join(base_path, name_with_owner.replace("/", "_")), cutoff_date)
+    return [_shas[i:i + shard_size] for i in range(0, len(_shas), shard_size)]
+
+def build_commits_shard(
     name_with_owner: str,
     base_path: str,
     cutoff_date: datetime,
+    shard_idx: int,
+    shas: list[str],
+    output_path: str = 'data_git',
+    commit_source: str = COMMIT_SOURCE,
 ):
-    """Build a dataset of commits for a repository."""
-    _df_commits = pd.DataFrame(
-        columns=["sha", "date", "name", "email", "files", "files_cnt", "add", "del", "sum", "aff"],
-    )
-    _df_commits.set_index("sha", inplace=True)
+    """Write the commits and file stats of one shard to its own part files.
+    The affiliation is left empty, it depends on every earlier commit and is filled in by merge_commits_shards.
+    """
+    _dest_path = os.path.join(base_path, name_with_owner.replace("/", "_"))
+    _shard_prefix = get_shard_prefix(name_with_owner, output_path, shard_idx)
+    _cnt = 0
+    with TableWriter(f'{_shard_prefix}_commits.parquet', GIT_COMMITS_SCHEMA, row_group_size=CHUNK_SIZE) as _commits_writer, \
+         TableWriter(f'{_shard_prefix}_files.parquet', GIT_FILE_STATS_SCHEMA, row_group_size=CHUNK_SIZE * 10) as _files_writer:
+        for _sha, _date, _name, _email, _file_stats, _add, _del, _sum in COMMIT_SOURCES[commit_source](_dest_path, cutoff_date, shas):
+            _commits_writer.write_row((_sha, _date, _name, _email, len(_file_stats), _add, _del, _sum, None))
+            for _path, _file_add, _file_del in _file_stats:
+                _files_writer.write_row((_sha, _path, _file_add, _file_del))
+            _cnt += 1
+    return _cnt
 
+def merge_commits_shards(
+    name_with_owner: str,
+    n_shards: int,
+    output_path: str = 'data_git',
+):
+    """Concatenate the shard part files in commit order into `{repo}_commits.parquet` and `{repo}_files.parquet`.
+    The affiliations are computed here, in commit order, so the "last known corporate email"
+    state is the same as in a single sequential walk.
+    """
     _author_aff = {}
+    _name_cnt = Counter()
 
-    _dest_path = os.path.join(base_path, name_with_owner.replace("/", "_"))
-    _total = count_commits(_dest_path)
-    repo = pydriller.Repository(_dest_path,to=cutoff_date)
-    # by default, pydriller traveses the whole history of the repo, by ascending order of commit time
-    for cmt in tqdm(repo.traverse_commits(), total=_total, desc=name_with_owner):
-        _df_commits.loc[cmt.hash] = [
-            cmt.author_date,
-            cmt.author.name,
-            cmt.author.email,
-            get_file_stats(cmt),
-            len(cmt.modified_files),
-            cmt.insertions,
-            cmt.deletions,
-            cmt.lines,
-            update_author_aff(cmt.author.name, cmt.author.email, _author_aff),
-        ]
+    _out_prefix = os.path.join(output_path, name_with_owner.replace("/", "_"))
+    _aff_idx = GIT_COMMITS_SCHEMA.get_field_index('aff')
+    with TableWriter(f'{_out_prefix}_commits.parquet', GIT_COMMITS_SCHEMA, row_group_size=CHUNK_SIZE) as _commits_writer, \
+         TableWriter(f'{_out_prefix}_files.parquet', GIT_FILE_STATS_SCHEMA, row_group_size=CHUNK_SIZE * 10) as _files_writer:
+        for _shard_idx in range(n_shards):
+            _shard_prefix = get_shard_prefix(name_with_owner, output_path, _shard_idx)
+            for _batch in iter_batches(f'{_shard_prefix}_commits.parquet'):
+                _names = _batch.column('name').to_pylist()
+                _emails = _batch.column('email').to_pylist()
+                _affs = [update_author_aff(_name, _email, _author_aff) for _name, _email in zip(_names, _emails)]
+                _name_cnt.update(_name.lower() for _name in _names)
+                _commits_writer.write_batch(_batch.set_column(_aff_idx, 'aff', pa.array(_affs, pa.string())))
+            for _batch in iter_batches(f'{_shard_prefix}_files.parquet'):
+                _files_writer.write_batch(_batch)
+            os.remove(f'{_shard_prefix}_commits.parquet')
+            os.remove(f'{_shard_prefix}_files.parquet')
 
     # count commits by author
-    _df_vc = pd.DataFrame(_df_commits['name'].str.lower().value_counts())
-    _df_vc.columns = ['commits_cnt']
+    _df_vc = pd.DataFrame(
+        pd.Series(_name_cnt, name='commits_cnt', dtype='int64').rename_axis('name').sort_values(ascending=False, kind='stable')
+    )
     # map author to affiliation
     _df_vc['aff'] = _df_vc.index.map(_author_aff)
 
@@ -143,35 +225,63 @@ def build_commits_dataset(
     _df_vc_10cmt = _df_vc[_df_vc['commits_cnt'] >= 10]
     print(f"{name_with_owner}: {sum(_df_vc_10cmt['aff'].isna())} of {_df_vc_10cmt.shape[0]} authors with >= 10 commits have no affiliation")
 
-    return _df_commits, _df_vc
+    return _df_vc
+
+def build_commits_dataset(
+    name_with_owner: str,
+    base_path: str,
+    cutoff_date: datetime,
+    output_path: str = 'data_git',
+    commit_source: str = COMMIT_SOURCE,
+):
+    """Build a dataset of commits for a repository, one shard after the other.
+    Commits go to `{repo}_commits.parquet` and the per-file stats to `{repo}_files.parquet`,
+    one (sha, path, add, del) row per modified file, both written in chunks.
+    """
+    _shards = shard_commits(name_with_owner, base_path, cutoff_date)
+    for _shard_idx, _shas in enumerate(tqdm(_shards, desc=name_with_owner)):
+        build_commits_shard(name_with_owner, base_path, cutoff_date, _shard_idx, _shas, output_path, commit_source)
+    return merge_commits_shards(name_with_owner, len(_shards), output_path)
+
+# BENCHMARK_COMMIT_SOURCES=1 compares the throughput of the commit sources before the run
+if os.environ.get('BENCHMARK_COMMIT_SOURCES'):
+    for p in PROJECTS:
+        benchmark_commit_sources(os.path.join('repo', p.replace("/", "_")), CUTOFF_DATE)
 
-def worker(name_with_owner: str):
-    _df, _vc = build_commits_dataset(name_with_owner, base_path='repo', cutoff_date=CUTOFF_DATE)
-    os.makedirs('data_git', exist_ok=True)
-    _df.to_csv(f'data_git/{name_with_owner.replace("/", "_")}_commits.csv')
-    _vc.to_csv(f'data_git/{name_with_owner.replace("/", "_")}_vc.csv')
+# shards of all repos share one pool, so a huge repo keeps every core busy after the small ones finish
+os.makedirs('data_git', exist_ok=True)
+_shard_cnt = {}
+_tasks = []
+for p in PROJECTS:
+    _shards = shard_commits(p, 'repo', CUTOFF_DATE)
+    _shard_cnt[p] = len(_shards)
+    _tasks.extend((p, 'repo', CUTOFF_DATE, _shard_idx, _shas, 'data_git', COMMIT_SOURCE) for _shard_idx, _shas in enumerate(_shards))
 
-with Pool(len(PROJECTS)) as pool:
-    for _ in pool.imap_unordered(worker, PROJECTS):
-        pass
+_start = time.perf_counter()
+_commit_cnt = Counter()
+with Pool(N_WORKERS) as pool:
+    for _p, _cnt in tqdm(pool.imap_unordered(lambda task: (task[0], build_commits_shard(*task)), _tasks), total=len(_tasks)):
+        _commit_cnt[_p] += _cnt
+_elapsed = time.perf_counter() - _start
+print(f"{COMMIT_SOURCE} read {sum(_commit_cnt.values())} commits in {_elapsed:.1f}s ({sum(_commit_cnt.values()) / max(_elapsed, 1e-9):.0f} commits/s) with {N_WORKERS} workers")
 
-### 3. Filtering out commits ###
+for p in PROJECTS:
+    _vc = merge_commits_shards(p, _shard_cnt[p], 'data_git')
+    _vc.to_csv(f'data_git/{p.replace("/", "_")}_vc.csv')
 
-with open("bots.json", "r") as f:
-    jb = json.load(f)
-    li = []
-    for k, v in jb.items():
-        li.extend(v)
-    BOTS = set(li)
+### 3. Filtering out commits ###
 
+# bots of every repo listed in bots.json, matched exactly like the names in _vc
+BOT_FILTER = BotFilter.for_repo(None, include_bot_dict=False)
 THRESHOLD = 5  # only keeping users with >=X commits
 
 for p in PROJECTS:
-    _df = pd.read_csv(f"data_git/{p.replace('/', '_')}_commits.csv")
+    _df = pd.read_parquet(f"data_git/{p.replace('/', '_')}_commits.parquet")
     _vc = pd.read_csv(f"data_git/{p.replace('/', '_')}_vc.csv")
     # drop bots
-    _vc = _vc[~_vc['name'].isin(BOTS)]
+    _vc, _bot_counts = BOT_FILTER.filter_frame(_vc, ['name'])
     print(p)
+    print(sum(_bot_counts.values()), 'bot authors dropped:', dict(_bot_counts))
     print(sum(_vc['aff'].isna()), 'of', _vc.shape[0], 'authors have no affiliation')
     _vc_filtered = _vc[_vc['commits_cnt'] >= THRESHOLD]
     print(sum(_vc_filtered['aff'].isna()), 
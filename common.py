@@ -1,7 +1,13 @@
+import hashlib
+import json
+import os
 import random
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 import config
 import time
+from token_scheduler import TokenScheduler
 
 # Function to handle rate limiting
 def handle_rate_limit(headers):
@@ -17,20 +23,144 @@ def handle_rate_limit(headers):
             print(f"Rate limit reached. Waiting for {wait_time} seconds...")
             time.sleep(wait_time)
 
+session = None
+
+# Function to get the pooled keep-alive session shared by all requests of this process
+def get_session():
+    global session
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=config.http_pool_size, pool_maxsize=config.http_pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+    return session
+
+class ResponseCache:
+    """On-disk cache of GET responses keyed by URL and params.
+
+    Each entry is a `<key>.json` file with the status, headers and validators (ETag,
+    Last-Modified) next to a `<key>.body` file with the raw content.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, url, params=None):
+        params = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        return hashlib.sha256(json.dumps([url, params]).encode('utf-8')).hexdigest()
+
+    def load(self, url, params=None):
+        key = self.key(url, params)
+        meta_path = os.path.join(self.folder, f'{key}.json')
+        body_path = os.path.join(self.folder, f'{key}.body')
+        if not os.path.exists(meta_path) or not os.path.exists(body_path):
+            return None
+        with open(meta_path, 'r') as meta_file:
+            entry = json.load(meta_file)
+        with open(body_path, 'rb') as body_file:
+            entry['content'] = body_file.read()
+        return entry
+
+    def store(self, url, params, response):
+        key = self.key(url, params)
+        # Write the body before the metadata, an entry only counts once its metadata exists
+        self._write(os.path.join(self.folder, f'{key}.body'), response.content)
+        entry = {
+            'url': url,
+            'params': params,
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'etag': response.headers.get('ETag', None),
+            'last_modified': response.headers.get('Last-Modified', None),
+            'stored_at': time.time(),
+        }
+        self._write(os.path.join(self.folder, f'{key}.json'), json.dumps(entry).encode('utf-8'))
+
+    def _write(self, path, content):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+
+    def to_response(self, entry, headers=None):
+        # Rebuild a requests.Response from a cache entry
+        response = requests.Response()
+        response.status_code = entry['status_code']
+        response._content = entry['content']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        if headers is not None:
+            # Keep the fresh rate limit headers of a 304
+            for header, value in headers.items():
+                if header.lower().startswith('x-ratelimit'):
+                    response.headers[header] = value
+        response.url = entry['url']
+        response.encoding = 'utf-8'
+        return response
+
+token_scheduler = None
+
+# Function to get the scheduler over config.github_token and config.github_tokens
+def get_token_scheduler():
+    global token_scheduler
+    if token_scheduler is None:
+        token_scheduler = TokenScheduler([config.github_token] + list(config.github_tokens))
+    return token_scheduler
+
+response_cache = None
+
+# Function to get the response cache, or None when caching is disabled
+def get_response_cache():
+    global response_cache
+    if response_cache is None and config.http_cache_dir:
+        response_cache = ResponseCache(config.http_cache_dir)
+    return response_cache
+
 # Function to send a GET request with timeout and rate limit handling
-def get_with_timeout(url, headers, params=None):
+# Cached responses are revalidated with If-None-Match / If-Modified-Since, and immutable
+# resources (e.g. a commit by SHA) are served from the cache without a request.
+# The Authorization header is set per attempt from the token with the most headroom.
+def get_with_timeout(url, headers, params=None, immutable=False):
+    cache = get_response_cache()
+    entry = cache.load(url, params) if cache is not None else None
+    if entry is not None and immutable:
+        return cache.to_response(entry)
+
+    request_headers = dict(headers)
+    if entry is not None:
+        if entry['etag']:
+            request_headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            request_headers['If-Modified-Since'] = entry['last_modified']
+
+    scheduler = get_token_scheduler()
     retries = 0
     while retries < config.max_retries:
+        token = scheduler.acquire()
+        if token is not None:
+            request_headers['Authorization'] = f'token {token}'
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = get_session().get(url, headers=request_headers, params=params, timeout=config.timeout)
+            scheduler.update(token, response.headers)
+            if response.status_code == 304 and entry is not None:
+                # Not modified, conditional requests don't count against the rate limit
+                return cache.to_response(entry, response.headers)
+            if scheduler.is_rate_limited(response):
+                # Park the token and retry with the next one, rate limits don't use up retries
+                print(f"Rate limit hit ({response.status_code}) for {url}. Switching token...")
+                scheduler.backoff(token, response)
+                continue
             if response.status_code == 403:
                 error_msg = response.json().get('message')
                 print(f"Network error 403 occurred: {str(error_msg)}. Retrying...")
+                retries += 1
+                time.sleep(config.retry_timeout)
                 continue
             response.raise_for_status()  # Raise an exception if the response contains an error status code
-            handle_rate_limit(response.headers)  # Check if the rate limit is reached
+            if cache is not None:
+                cache.store(url, params, response)
             return response
-        except (requests.exceptions.RequestException, requests.exceptions.HTTPError) as e:
+        except (requests.exceptions.RequestException, requests.exceptions.HTTPError, ValueError) as e:
             print(f"Network error occurred: {str(e)}. Retrying...")
             retries += 1
             time.sleep(config.timeout)  # Apply the timeout in case of a network error
@@ -0,0 +1,75 @@
+from collections import deque
+
+# Multi-pattern substring matching of company names in free text (GitHub company and bio fields).
+
+# Punctuation replaced by spaces before matching, e.g. "Google, Inc." -> "google  inc "
+PUNCTUATION_TABLE = str.maketrans({'.': ' ', ',': ' ', ';': ' ', ':': ' '})
+
+def normalize_text(text: str) -> str:
+    """Lowercase the text and replace special characters with spaces."""
+    return text.lower().translate(PUNCTUATION_TABLE)
+
+class CompanyMatcher:
+    """Aho-Corasick automaton over the keys of a {pattern: company} dict, built once at load time.
+
+    A text is scanned in a single pass whatever the number of patterns. When several patterns occur
+    in the text the one listed first in the dict wins, the same result as testing `pattern in text`
+    for every pattern in dict order.
+    """
+
+    def __init__(self, patterns: dict[str, str]):
+        self.patterns = list(patterns)
+        self.companies = list(patterns.values())
+        # goto[node] maps a character to the next node, node 0 is the root
+        self.goto = [{}]
+        # best[node] is the smallest index of a pattern ending at node, or len(patterns) if none
+        no_match = len(self.patterns)
+        self.best = [no_match]
+        for idx, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                next_node = self.goto[node].get(char, None)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.best.append(no_match)
+                node = next_node
+            self.best[node] = min(self.best[node], idx)
+
+        # Breadth-first failure links, every node also reports the patterns of its longest proper suffix
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self.goto[node].items():
+                fail_node = self.fail[node]
+                while fail_node and char not in self.goto[fail_node]:
+                    fail_node = self.fail[fail_node]
+                self.fail[next_node] = self.goto[fail_node].get(char, 0)
+                self.best[next_node] = min(self.best[next_node], self.best[self.fail[next_node]])
+                queue.append(next_node)
+
+    def find(self, text: str):
+        """Return the index of the first-listed pattern occurring in text, or None."""
+        goto = self.goto
+        fail = self.fail
+        best = self.best
+        found = best[0]
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if best[node] < found:
+                found = best[node]
+                if found == 0:
+                    break
+        return found if found < len(self.patterns) else None
+
+    def match(self, text: str):
+        """Return the (pattern, company) pair matched in text, or (None, None)."""
+        idx = self.find(text)
+        if idx is None:
+            return None, None
+        return self.patterns[idx], self.companies[idx]
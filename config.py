@@ -1,7 +1,25 @@
 timeout = 10 # Set the default timeout value for all requests
 retry_timeout = 10 # Set the retry timeout value for network errors
 max_retries = 3 # Set the number of retries for network errors
+commit_list_checkpoint_interval = 5000 # Save the commit list cache every N commits so interrupted runs can resume
+storage_format = 'csv' # 'csv', or 'parquet' / 'arrow' for typed columnar commit lists and edge lists (needs pyarrow)
+row_group_size = 100000 # Rows per Parquet row group / Arrow record batch
+edge_engine = 'loop' # 'loop' pairs touch points per file, 'sparse' projects per-release user x file matrices (needs scipy)
+edge_workers = 1 # More than 1 builds each release's edges in a pool of this many processes
+write_bipartite_cln_to_file = False # Also stream the per-file bipartite edge list (very large)
+edge_compression = None # None, 'gzip' or 'zstd' (needs zstandard) for csv edge lists
+edge_write_buffer_size = 8 * 1024 * 1024 # Bytes buffered before edge rows are written out
 github_token = ''
+github_tokens = [] # Extra tokens, requests go to whichever token has the most rate limit headroom
+github_api_url = 'https://api.github.com' # Point at a local stub server for testing
+http_pool_size = 16 # Keep-alive connections kept open per host
+http_cache_dir = 'Data/HTTP_Cache' # On-disk response cache, None disables it
+async_api_fallback = True # Queue commits missing locally and fetch them concurrently from the API after the history walk
+api_max_concurrency = 8 # Upper bound on concurrent API requests, also bounded by the remaining rate limit
+release_assignment = 'date' # 'date' bins commits by the next release date, 'ancestry' by the first release containing them (rebuild the commit list cache when switching)
+commit_stats_engine = 'log' # 'log' reads all commit stats in one streaming git log pass, 'show' runs git show per commit
+clone_mirror_dir = 'Data/Mirrors' # Shared bare mirrors for repos cloned with 'clone_mode': 'mirror'
+# Optional per repo: 'clone_mode' is 'full' (default), 'blobless', 'shallow' (with 'shallow_since': 'YYYY-MM-DD') or 'mirror'
 repo_list = [
     {'name': 'transformers',
      'owner': 'huggingface',
@@ -0,0 +1,81 @@
+import csv
+import gzip
+import io
+import os
+from tqdm.auto import tqdm
+
+# Streaming sinks for the commit network edge lists.
+# Every sink has write_row() and close(), so the edge builders don't care where rows end up.
+
+COMPRESSION_EXTENSIONS = {
+    None: '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+def open_text_stream(path, compression=None, buffer_size=1024 * 1024):
+    """Open path for appending text, optionally gzip or zstd compressed, behind a large write buffer."""
+    if compression is None:
+        return open(path, 'a', newline='', encoding='utf-8', buffering=buffer_size)
+    if compression == 'gzip':
+        # Appending adds a new gzip member, which readers treat as one continuous stream
+        raw = gzip.open(path, 'ab', compresslevel=6)
+    elif compression == 'zstd':
+        import zstandard
+        raw = zstandard.ZstdCompressor(level=3).stream_writer(open(path, 'ab'))
+    else:
+        raise ValueError(f'Unknown compression: {compression}')
+    return io.TextIOWrapper(io.BufferedWriter(raw, buffer_size), newline='', encoding='utf-8')
+
+class CsvEdgeSink:
+    """Append edge rows to a (compressed) csv file, writing the header when the file is new."""
+
+    def __init__(self, path, fields, compression=None, buffer_size=1024 * 1024):
+        new_file = not os.path.exists(path)
+        self.file = open_text_stream(path, compression, buffer_size)
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(fields)
+
+    def write_row(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def open_edge_sink(folder, file_stem, fields, schema=None, storage_format='csv', compression=None, buffer_size=1024 * 1024, row_group_size=100000):
+    """Open the sink for one edge list, csv files get the compression extension appended."""
+    if storage_format == 'csv':
+        path = os.path.join(folder, f'{file_stem}.csv' + COMPRESSION_EXTENSIONS[compression])
+        return CsvEdgeSink(path, fields, compression, buffer_size)
+
+    # Parquet and Arrow IPC compress their columns themselves
+    import columnar
+    path = os.path.join(folder, f'{file_stem}.{storage_format}')
+    return columnar.TableWriter(path, schema, storage_format, row_group_size)
+
+class ThrottledProgress:
+    """tqdm progress bar that is only updated every `every` rows instead of refreshed per row."""
+
+    def __init__(self, total, every=10000):
+        self.pbar = tqdm(total=total, position=0, leave=True, dynamic_ncols=True)
+        self.every = every
+        self.pending = 0
+
+    def update(self, n=1):
+        self.pending += n
+        if self.pending >= self.every:
+            self.pbar.update(self.pending)
+            self.pending = 0
+
+    def close(self):
+        self.pbar.update(self.pending)
+        self.pending = 0
+        self.pbar.close()
+        tqdm._instances.clear()
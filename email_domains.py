@@ -0,0 +1,137 @@
+from functools import lru_cache
+import pandas as pd
+
+# Classification of email domains into public mail providers and corporate domains,
+# shared by commits-from-git.py and ident-aff.py.
+#
+# This replaced the is_corporate_domain copies of both scripts, which tested the domain against the
+# public list as is and then looked for '.com', '.io', '.ai' or '.co' anywhere in it. The results
+# differ, so the aff columns of earlier runs are not directly comparable:
+#   - corporate suffixes must end the domain, e.g. x.cosmos.edu, dev.company.org and lab.ai.mil
+#     were corporate before and are not anymore (x.co.uk, x.com.cn still are, as com.* and co.*)
+#   - a suffix alone is not corporate, e.g. com.cn, there has to be a label in front of it
+#   - subdomains of public providers are public, e.g. mail.gmail.com was corporate before
+#   - domains are lowercased before the lookup, commits-from-git.py used to compare them as is,
+#     so e.g. Gmail.com was corporate there
+# The company inferred by ident-aff.py (the label in front of the corporate suffix) is unchanged
+# for every domain that is corporate under both rules.
+
+# the most exhaustive list of email domains
+# https://gist.github.com/ammarshah/f5c2624d767f91a7cbdc4e54db8dd0bf
+PUBLIC_EMAIL_DOMAINS_PATH = 'public_email_domains.txt'
+
+# it's very hard to tell if a domain is corporate or not, these suffixes are,
+# e.g. .com .co .ai .io .com.* .co.* ('*' matches any single label)
+CORPORATE_SUFFIXES = ['com', 'io', 'ai', 'co', 'com.*', 'co.*']
+
+# some companies have multiple domains
+COMPANY_EMAIL_MAP = {
+    'fb.com': 'facebook',
+}
+
+# trie node keys that can't collide with a domain label
+PUBLIC = '$public'
+CORPORATE = '$corporate'
+
+def load_public_domains(path: str = PUBLIC_EMAIL_DOMAINS_PATH):
+    with open(path, 'r') as f:
+        _domains = set(f.read().splitlines())
+    _domains.add('users.noreply.github.com')
+    return _domains
+
+class DomainClassifier:
+    """Reversed-label suffix trie over the public email domains and the corporate suffixes.
+
+    A domain is walked from its last label, so "mail.google.co.uk" tries uk -> co -> google -> mail.
+    A domain is public if it or one of its parent domains is a public mail provider, and corporate
+    if it isn't public and ends with a corporate suffix after at least one more label. The company
+    is the label in front of the longest corporate suffix. Results are memoized per domain.
+    """
+
+    def __init__(self, public_domains, corporate_suffixes=CORPORATE_SUFFIXES, company_email_map=COMPANY_EMAIL_MAP, cache_size=1 << 16):
+        self.root = {}
+        for domain in public_domains:
+            if domain:
+                self._insert(domain, PUBLIC)
+        for suffix in corporate_suffixes:
+            self._insert(suffix, CORPORATE)
+        self.company_email_map = company_email_map
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _insert(self, domain, terminal):
+        node = self.root
+        for label in reversed(domain.lower().split('.')):
+            node = node.setdefault(label, {})
+        node[terminal] = True
+
+    def _match(self, labels):
+        # labels are reversed, returns (is_public, length of the longest corporate suffix)
+        public = False
+        suffix_len = 0
+        nodes = [self.root]
+        for depth, label in enumerate(labels, 1):
+            next_nodes = []
+            for node in nodes:
+                for key in (label, '*'):
+                    child = node.get(key, None)
+                    if child is None:
+                        continue
+                    if PUBLIC in child:
+                        public = True
+                    if CORPORATE in child:
+                        suffix_len = max(suffix_len, depth)
+                    next_nodes.append(child)
+            if not next_nodes:
+                break
+            nodes = next_nodes
+        return public, suffix_len
+
+    def _classify(self, domain):
+        """Return (is_corporate, company) for a domain."""
+        if not domain:
+            return False, None
+        domain = domain.lower()
+        labels = domain.split('.')[::-1]
+        public, suffix_len = self._match(labels)
+        if public or suffix_len == 0 or len(labels) <= suffix_len:
+            return False, None
+        if domain in self.company_email_map:
+            return True, self.company_email_map[domain]
+        return True, labels[suffix_len]
+
+    def is_corporate_domain(self, domain):
+        """Check if a email domain is corporate."""
+        return self.classify(domain)[0]
+
+    def infer_aff_from_email(self, email):
+        """Infers user's affiliation by email (or by its domain alone)."""
+        if not email or pd.isna(email):
+            return None
+        return self.classify(email.split('@')[-1])[1]
+
+    def classify_emails(self, emails: pd.Series):
+        """Vectorized infer_aff_from_email over a Series of emails or domains, each distinct domain is classified once."""
+        _domains = emails.where(emails.notna() & (emails != ''), None).astype(object).str.split('@').str[-1].str.lower()
+        _affs = {_domain: self.classify(_domain)[1] for _domain in pd.unique(_domains.dropna())}
+        return _domains.map(_affs)
+
+_default_classifier = None
+
+def get_classifier():
+    """Return the classifier over public_email_domains.txt, loaded on first use."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = DomainClassifier(load_public_domains())
+    return _default_classifier
+
+def is_corporate_domain(domain):
+    """Check if a email domain is corporate."""
+    return get_classifier().is_corporate_domain(domain)
+
+def infer_aff_from_email(email):
+    """Infers user's affiliation by email"""
+    return get_classifier().infer_aff_from_email(email)
+
+def classify_emails(emails: pd.Series):
+    """Infers the affiliation of every email in a Series in one call."""
+    return get_classifier().classify_emails(emails)
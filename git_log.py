@@ -0,0 +1,155 @@
+import subprocess
+
+# Streams commit data out of a single `git log` pass instead of spawning one git process per commit.
+
+# Record separator placed in front of every commit header, numstat lines never start with it
+COMMIT_MARKER = '\x1e'
+COMMIT_FORMAT = f'{COMMIT_MARKER}%H%x00%an%x00%ae%x00%at'
+
+# Paths are printed as they are instead of C-quoted with octal escapes for every non-ASCII byte.
+# git still quotes paths holding '"', '\\' or control characters, unquote_path decodes those.
+GIT_OPTIONS = ['-c', 'core.quotePath=false']
+C_ESCAPES = {'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13, '"': 34, '\\': 92}
+
+def unquote_path(path):
+    """Decode a path C-quoted by git ("dir/a\\tb.txt"), other paths are returned unchanged."""
+    if len(path) < 2 or path[0] != '"' or path[-1] != '"':
+        return path
+    raw = bytearray()
+    i = 1
+    while i < len(path) - 1:
+        if path[i] != '\\':
+            raw += path[i].encode('utf-8', 'surrogateescape')
+            i += 1
+        elif path[i + 1] in '01234567':
+            raw.append(int(path[i + 1:i + 4], 8))
+            i += 4
+        else:
+            raw.append(C_ESCAPES[path[i + 1]])
+            i += 2
+    return raw.decode('utf-8', 'surrogateescape')
+
+def parse_numstat_path(file_name):
+    """Unquote the path of a numstat line, rename entries ("old => new") are kept as git prints them."""
+    return file_name if ' => ' in file_name else unquote_path(file_name)
+
+def parse_numstat_line(line):
+    """Parse a `git --numstat` line into a (file_name, additions, deletions, changes) tuple."""
+    line_segments = line.split('\t')
+    additions = int(line_segments[0])
+    deletions = int(line_segments[1])
+    file_name = parse_numstat_path(line_segments[2])
+    return (file_name, additions, deletions, additions + deletions)
+
+def resolve_rename(file_name):
+    """Return the new path of a numstat rename entry ("old => new" or "dir/{old => new}/file")."""
+    if ' => ' not in file_name:
+        return unquote_path(file_name)
+    # git only abbreviates with braces when neither path needs quoting
+    if '{' in file_name and not file_name.startswith('"'):
+        prefix, rest = file_name.split('{', 1)
+        middle, suffix = rest.split('}', 1)
+        return (prefix + middle.split(' => ', 1)[1] + suffix).replace('//', '/').lstrip('/')
+    return unquote_path(file_name.split(' => ', 1)[1])
+
+def list_merges(repo_path, revs=('HEAD',), no_walk=False):
+    """Return the set of merge commits reachable from revs, or among revs with no_walk."""
+    command = ['git', '-C', str(repo_path), 'rev-list', '--merges']
+    if no_walk:
+        command.extend(['--no-walk=unsorted', '--stdin'])
+    else:
+        command.extend(revs)
+    output = subprocess.run(command, input=''.join(f'{rev}\n' for rev in revs) if no_walk else None,
+                            stdout=subprocess.PIPE, encoding='utf-8', check=True).stdout
+    return set(output.split())
+
+def get_committer_date_range(repo_path, shas):
+    """Return the (earliest, latest) committer timestamps of the given commits."""
+    command = ['git', '-C', str(repo_path), 'log', '--no-walk=unsorted', '--stdin', '--format=%ct']
+    output = subprocess.run(command, input=''.join(f'{sha}\n' for sha in shas),
+                            stdout=subprocess.PIPE, encoding='utf-8', check=True).stdout
+    timestamps = [int(timestamp) for timestamp in output.split()]
+    return min(timestamps), max(timestamps)
+
+def _mark_deletions(file_stats, deleted):
+    if not deleted or file_stats is None:
+        return file_stats
+    return [(None if file_name in deleted else file_name, *stats) for file_name, *stats in file_stats]
+
+def iter_numstat(repo_path, revs=('HEAD',), skip=0, reverse=False, until=None, combined_merges=True, binary_as_zero=False, no_walk=False,
+                 first_parent_merges=False, deletions_as_none=False):
+    """Yield (sha, author_name, author_email, authored_date, file_stats) for every commit reachable from revs.
+
+    file_stats holds the same tuples as `get_commit_stats` in commit-network.py, and is None when a
+    line could not be parsed (e.g. binary files), exactly where the per-commit `git show` path fails.
+    Merge commits use the same combined diff as `git show`. The history is read incrementally, so
+    memory stays flat regardless of the repository size.
+
+    reverse lists the oldest commit first and until drops commits committed after that datetime.
+    With combined_merges=False merge commits have no file stats, and with binary_as_zero binary
+    files count as 0 lines instead of failing the commit, like pydriller. With no_walk revs are
+    the exact commits to list, in that order, and are passed on stdin so shards can be large.
+    With first_parent_merges merge commits are diffed against their first parent instead (this
+    takes precedence over combined_merges), and with deletions_as_none deleted files have None as
+    their file name, like the new path of a pydriller modified file.
+    """
+    command = ['git', '-C', str(repo_path), *GIT_OPTIONS, 'log', '--numstat', f'--format={COMMIT_FORMAT}']
+    if first_parent_merges:
+        command.append('--diff-merges=first-parent')
+    elif combined_merges:
+        command.append('--cc')
+    if deletions_as_none:
+        # --raw lines (":<modes> <blobs> <status>\t<path>") tell which files were deleted
+        command.append('--raw')
+    if skip:
+        command.append(f'--skip={skip}')
+    if reverse:
+        command.append('--reverse')
+    if until is not None:
+        command.append(f'--until={until.isoformat()}')
+    if no_walk:
+        command.extend(['--no-walk=unsorted', '--stdin'])
+    else:
+        command.extend(revs)
+    command.append('--')
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE if no_walk else None, stdout=subprocess.PIPE,
+                               encoding='utf-8', errors='surrogateescape')
+    if no_walk:
+        # git reads every rev from stdin before it starts writing
+        process.stdin.write(''.join(f'{rev}\n' for rev in revs))
+        process.stdin.close()
+    header = None
+    file_stats = []
+    deleted = set()
+    try:
+        for line in process.stdout:
+            line = line.rstrip('\n')
+            if line.startswith(COMMIT_MARKER):
+                if header is not None:
+                    yield (*header, _mark_deletions(file_stats, deleted))
+                sha, author_name, author_email, authored_date = line[len(COMMIT_MARKER):].split('\x00')
+                header = (sha, author_name, author_email, int(authored_date))
+                file_stats = []
+                deleted = set()
+            elif deletions_as_none and line.startswith(':'):
+                status, file_name = line.split('\t', 1)
+                if status.split()[-1] == 'D':
+                    deleted.add(unquote_path(file_name))
+            elif line and file_stats is not None:
+                if binary_as_zero and line.startswith('-\t-\t'):
+                    file_stats.append((parse_numstat_path(line.split('\t', 2)[2]), 0, 0, 0))
+                    continue
+                try:
+                    file_stats.append(parse_numstat_line(line))
+                except (ValueError, IndexError):
+                    file_stats = None
+        if header is not None:
+            yield (*header, _mark_deletions(file_stats, deleted))
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
@@ -14,6 +14,10 @@ import re
 from pprint import pprint
 from typing import Union, Literal, Tuple
 from tqdm.auto import tqdm
+from identity import IdentityIndex
+from company_matcher import CompanyMatcher, normalize_text
+from email_domains import infer_aff_from_email, classify_emails
+from bot_filter import BotFilter
 
 PROJECTS = [
     'huggingface/transformers',
@@ -31,86 +35,50 @@ THRESHOLD = 5
 # pytorch's donation to linux foundation
 CUTOFF_DATE = datetime(2022, 9, 12, tzinfo=pytz.UTC)
 
-# bots list
-with open("bots.json", "r") as f:
-    jb = json.load(f)
-    li = []
-    for k, v in jb.items():
-        li.extend(v)
-    BOTS = set(li)
-
-# the most exhaustive list of email domains
-# https://gist.github.com/ammarshah/f5c2624d767f91a7cbdc4e54db8dd0bf
-with open('public_email_domains.txt', 'r') as f:
-    PUBLIC_EMAIL_DOMAINS = set(f.read().splitlines())
-    PUBLIC_EMAIL_DOMAINS.add('users.noreply.github.com')
-
-def is_corporate_domain(domain: str | None):
-    """Check if a email address is corporate email."""
-    if domain in PUBLIC_EMAIL_DOMAINS or domain is None:
-        return False
-    # it's very hard to tell if a domain is corporate or not,
-    # e.g. .com .co .ai .io .com.* .co.*
-    for pat in '.com', '.io', '.ai', '.co':
-        if pat in domain:
-            return True
-    return False
+# bots of every repo listed in bots.json
+BOT_FILTER = BotFilter.for_repo(None, include_bot_dict=False)
 
 with open('company_ident_patterns.json', 'r') as f:
     COMPANY_PATTERNS = json.load(f)
-# some companies have multiple domains
-COMPANY_EMAIL_MAP = {
-    'fb.com': 'facebook',
-}
+# compiled once, earlier patterns in the json win when several match
+COMPANY_MATCHER = CompanyMatcher(COMPANY_PATTERNS)
 COMPANY_ORG_PATTERN = re.compile(r'@([a-zA-Z0-9\-_]+)')
 
-def infer_aff_from_email(
-    email: Union[str, None],
-):
-    """Infers user's affiliation by email"""
-    if not email or pd.isna(email):
-        return None
-    _email_aff = email.lower().split('@')[-1]
-    if not is_corporate_domain(_email_aff):
-        return None
-    if _email_aff in COMPANY_EMAIL_MAP:
-        return COMPANY_EMAIL_MAP[_email_aff]
-    _split = _email_aff.split('.')
-    if _split[-2] in ('com', 'co'):  # .co.in, .com.cn
-        return _split[-3]  
-    else:
-        return _split[-2]
-    
-def infer_user_aff(row) -> Union[Tuple[str, str], Tuple[None, None]]:
-    """Infer user's affiliation from email, company name, and more."""
+def infer_user_aff(row, return_pattern: bool = False):
+    """Infer user's affiliation from email, company name, and more.
+    With return_pattern, the company pattern that matched (if any) is returned as a third value for auditing.
+    """
+    _aff, _ident_by, _pattern = _infer_user_aff(row)
+    if return_pattern:
+        return _aff, _ident_by, _pattern
+    return _aff, _ident_by
+
+def _infer_user_aff(row) -> Union[Tuple[str, str, str | None], Tuple[None, None, None]]:
     if pd.isna(row['Author Email']):
-        return None, None
+        return None, None, None
     _email_aff = row['Author Email'].split('@')[-1] if row['Author Email'] else None
     if not _email_aff and row['Login Email']:
         _email_aff = row['Login Email'].split('@')[-1]
     _aff = infer_aff_from_email(_email_aff)
     if _aff:
-        return _aff, 'email'
+        return _aff, 'email', None
     
     # find org references in 'Author Company', e.g. @google
     if not pd.isna(row['Author Company']):
         _orgs = COMPANY_ORG_PATTERN.findall(row['Author Company'])
         if _orgs:
-            return ','.join(_orgs), 'company_org'  # @tensorflow, @google
+            return ','.join(_orgs), 'company_org', None  # @tensorflow, @google
 
     # match natural language patterns, e.g. Work at Google
     for _ident_by, _text in ('company_text', row['Author Company']), ('bio_text', row['Author Bio']):  # Company is always over Bio
         if pd.isna(_text):
             continue
-        _text = _text.lower()
-        # remove special characters
-        _text = _text.replace('.', ' ').replace(',', ' ').replace(';', ' ').replace(':', ' ')
-        # try to match
-        for _pat, _aff in COMPANY_PATTERNS.items():
-            if _pat in _text:
-                return _aff, _ident_by
+        # lowercase, remove special characters and scan for every pattern at once
+        _pat, _aff = COMPANY_MATCHER.match(normalize_text(_text))
+        if _pat is not None:
+            return _aff, _ident_by, _pat
     
-    return None, None
+    return None, None, None
 
 
 for name_with_owner in PROJECTS:
@@ -118,60 +86,48 @@ for name_with_owner in PROJECTS:
 
     with open(os.path.join('Username_info', name_with_owner.split('/')[-1] + '_after_merging.json')) as f:
         _obj = json.load(f)
-    _email_to_id = {}
-    _name_to_id = {}
-    for _id, _v in _obj.items():
-        for em in _v["emails"]:
-            _email_to_id[em] = int(_id)
-        for name in _v["names"]:
-            _name_to_id[name.lower()] = int(_id)
-
-    def get_user_id(row):
-        _email = row['Author Email']
-        if not pd.isna(_email):
-            if _email in _email_to_id:
-                return _email_to_id[_email]
-        _name = row['Author Name']
-        if not pd.isna(_name):
-            _name = _name.lower()
-            if _name in _name_to_id:
-                return _name_to_id[_name]
-        return None
-
-    df_authors = pd.DataFrame(
-        columns=['login', 'name', 'email', 'company', 'location', 'bio', 'twitter', 'id', 'aff', 'ident_by'],
-    )
-    df_authors.set_index('login', inplace=True)
+    identity_index = IdentityIndex(_obj)
 
     # 1. Identify affiliations
-    for idx, row in tqdm(df_commits_info.iterrows(), total=len(df_commits_info)):
-        _name = row['Author Name']
-        _email = row['Author Email'] if pd.notna(row['Author Email']) else row['Login Email']
-
-        _login = row['Login Name']
-        if pd.isna(_login):
-            _login = _email  # special case for unmatched users
-
-        _company = row['Author Company']
-        _location = row['Author Location']
-        _bio = row['Author Bio']
-        _twitter = row['Author Twitter Username']
-        _id = get_user_id(row)
-        _aff, _ident_by = infer_user_aff(row)
-        df_authors.loc[_login] = (_name, _email, _company, _location, _bio, _twitter, _id, _aff, _ident_by)
-
-    def apply_wrapper(df: pd.DataFrame):
-        _df_dropna = df['aff'].dropna()
-        if _df_dropna.empty:
-            return df
-        _first_aff = _df_dropna.iloc[0]
-        for idx in df[df['aff'].isna()].index:
-            print(idx, _first_aff)
-            df_authors.loc[idx, 'aff'] = _first_aff
-            df_authors.loc[idx, 'ident_by'] = 'merged'
+    # every login keeps the fields of its last commit, in the order the logins first appear
+    _df_info = df_commits_info.copy()
+    _df_info['email'] = _df_info['Author Email'].where(_df_info['Author Email'].notna(), _df_info['Login Email'])
+    _df_info['login'] = _df_info['Login Name'].where(_df_info['Login Name'].notna(), _df_info['email'])  # special case for unmatched users
+    _df_info = _df_info.drop_duplicates('login', keep='last').set_index('login').reindex(_df_info['login'].drop_duplicates())
+
+    # infer the affiliation once per unique tuple of the fields infer_user_aff reads
+    _aff_keys = ['Author Email', 'Login Email', 'Author Company', 'Author Bio']
+    _df_aff = _df_info[_aff_keys].drop_duplicates()
+    _df_aff = pd.concat([_df_aff, pd.DataFrame(
+        [infer_user_aff(_row, return_pattern=True) for _row in _df_aff.to_dict('records')],
+        columns=['aff', 'ident_by', 'aff_pattern'], index=_df_aff.index,
+    )], axis=1)
+    _df_info = _df_info.reset_index().merge(_df_aff, on=_aff_keys, how='left')
+
+    df_authors = pd.DataFrame({
+        'login': _df_info['login'],
+        'name': _df_info['Author Name'],
+        'email': _df_info['email'],
+        'company': _df_info['Author Company'],
+        'location': _df_info['Author Location'],
+        'bio': _df_info['Author Bio'],
+        'twitter': _df_info['Author Twitter Username'],
+        'id': identity_index.resolve_uids(_df_info['Author Email'], _df_info['Author Name']),
+        'aff': _df_info['aff'],
+        'ident_by': _df_info['ident_by'],
+    }).set_index('login')
+
+    # logins merged into one id share the first known affiliation of the id
+    _first_aff = df_authors.groupby('id')['aff'].transform('first')
+    _merged = df_authors['aff'].isna() & _first_aff.notna()
+    df_authors.loc[_merged, 'aff'] = _first_aff[_merged]
+    df_authors.loc[_merged, 'ident_by'] = 'merged'
+    print(df_authors.loc[_merged, 'aff'])
+
+    # keep the company patterns behind text matches for auditing
+    _df_audit = _df_info.loc[_df_info['aff_pattern'].notna(), ['login', 'Author Company', 'Author Bio', 'ident_by', 'aff_pattern', 'aff']]
+    _df_audit.to_csv(os.path.join('data_git', name_with_owner.replace('/', '_') + '_aff_patterns.csv'), index=False)
 
-    _df_duplicates = df_authors[df_authors['id'].duplicated(keep=False)].sort_values('id')
-    _df_duplicates.groupby('id').apply(apply_wrapper)
     _df_duplicates = df_authors[df_authors['id'].duplicated(keep=False)].sort_values('id')
     print("Duplicates:", _df_duplicates)
     _has_company = df_authors['company'].notna()
@@ -179,16 +135,13 @@ for name_with_owner in PROJECTS:
     print("Failed to ident:", df_authors[(_has_company) & _no_aff & df_authors['company'].str.contains('@', case=False)])
 
     # 2. Remove bots
-    dict_login_to_id = df_authors['id'].to_dict()
-    bots_id = set()
-    for _login in BOTS:
-        if _login in dict_login_to_id:
-            bots_id.add(dict_login_to_id[_login])
+    _bot_logins = BOT_FILTER.match_series(df_authors.index.to_series()).notna()
+    bots_id = set(df_authors.loc[_bot_logins.values, 'id'])
 
-    df_commits = pd.read_csv(f"data_git/{name_with_owner.replace('/', '_')}_commits.csv")
+    df_commits = pd.read_parquet(f"data_git/{name_with_owner.replace('/', '_')}_commits.parquet")
     df_commits['Author Name'] = df_commits['name']
     df_commits['Author Email'] = df_commits['email']
-    df_commits['author_id'] = df_commits.apply(get_user_id, axis=1)  # user with an ID can be a bot
+    df_commits['author_id'] = identity_index.resolve_uids(df_commits['Author Email'], df_commits['Author Name'])  # user with an ID can be a bot
     df_no_bot = df_commits[df_commits['sha'].isin(df_commits_info['SHA'])]  
     df_no_bot.drop(columns=['Author Name', 'Author Email'], inplace=True)
     df_no_bot[df_no_bot['author_id'].isna()]
@@ -211,7 +164,7 @@ for name_with_owner in PROJECTS:
     df_inconsistent.to_csv(os.path.join('data_git', name_with_owner.replace('/', '_') + f'_commits_merged_{THRESHOLD}commits_inconsistent.csv'))
 
     # Email aff should override user aff
-    df_join['aff_email'] = df_join['aff_email'].apply(infer_aff_from_email)
+    df_join['aff_email'] = classify_emails(df_join['aff_email'])
     df_join['aff'] = df_join['aff'].str.lower()
 
     # 4. Print stats
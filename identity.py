@@ -0,0 +1,87 @@
+import numpy as np
+
+# Hash-indexed lookups over the merged users JSON produced by username_merging.py.
+
+class IdentityIndex:
+    """Name, email and (name, email) lookups over merged users, built once per repository.
+
+    The merged users data maps a uid to {'names': [...], 'emails': [...]}. Uids are kept as they
+    appear in the JSON (strings) and lookups return -1 when nothing matches.
+    """
+
+    def __init__(self, merged_user_data):
+        # name -> uids and email -> uids, in the order of the merged users data
+        self.name_to_uids = {}
+        self.email_to_uids = {}
+        # lowercased name -> uid, the last uid wins like ident-aff.py's mapping
+        self.name_lower_to_uid = {}
+        # exact (name, email) -> uid, filled as pairs are resolved
+        self.pair_to_uid = {}
+        self.uid_order = {}
+
+        for order, uid in enumerate(merged_user_data):
+            self.uid_order[uid] = order
+            for name in merged_user_data[uid]['names']:
+                self.name_to_uids.setdefault(name, []).append(uid)
+                self.name_lower_to_uid[name.lower()] = uid
+            for email in merged_user_data[uid]['emails']:
+                self.email_to_uids.setdefault(email, []).append(uid)
+
+        # First uid per name and per email
+        self.name_to_uid = {name: uids[0] for name, uids in self.name_to_uids.items()}
+        self.email_to_uid = {email: uids[0] for email, uids in self.email_to_uids.items()}
+
+    def by_name(self, name, default=-1):
+        return self.name_to_uid.get(name, default)
+
+    def by_email(self, email, default=-1):
+        return self.email_to_uid.get(email, default)
+
+    def by_name_lower(self, name, default=-1):
+        return self.name_lower_to_uid.get(name.lower(), default)
+
+    def lookup(self, name, email):
+        """Resolve an author to a uid: first a uid holding both name and email, then either one."""
+        pair = (name, email)
+        uid = self.pair_to_uid.get(pair, None)
+        if uid is not None:
+            return uid
+
+        name_uids = self.name_to_uids.get(name, [])
+        email_uids = self.email_to_uids.get(email, [])
+
+        # Check to see if the email and name is contained.
+        both_uids = set(name_uids).intersection(email_uids)
+        if both_uids:
+            uid = min(both_uids, key=self.uid_order.get)
+        # Fall back to name or email lookup
+        elif name_uids or email_uids:
+            uid = min(name_uids[:1] + email_uids[:1], key=self.uid_order.get)
+        else:
+            return -1
+
+        self.pair_to_uid[pair] = uid
+        return uid
+
+    def resolve_uids(self, emails, names):
+        """Vectorized email-first, then lowercased-name uid lookup over two pandas Series.
+
+        Returns a nullable Int64 Series aligned with emails, <NA> where neither matches. Each
+        distinct email and name is looked up once, so the cost grows with the number of
+        distinct values rather than the number of rows.
+        """
+        # pandas is only needed by the batch resolver
+        import pandas as pd
+
+        email_uids = _map_distinct(emails, self.email_to_uid)
+        name_uids = _map_distinct(names.astype(object).str.lower(), self.name_lower_to_uid)
+        uids = np.where(pd.notna(email_uids), email_uids, name_uids)
+        return pd.Series(pd.array(uids, dtype='Int64'), index=emails.index)
+
+def _map_distinct(values, mapping):
+    # Factorize so every distinct value hits the dict once, then scatter the int uids back to the rows
+    import pandas as pd
+
+    codes, uniques = pd.factorize(values)
+    uids = np.array([int(mapping[value]) if value in mapping else np.nan for value in uniques] + [np.nan], dtype=np.float64)
+    return uids[codes]
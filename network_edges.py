@@ -0,0 +1,146 @@
+import numpy as np
+from tqdm.auto import tqdm
+
+# Per-release co-modification edge construction for commit networks.
+# Takes the commit list network {(uid, file, release): (name, email, loc_added, loc_deleted, loc_changed)}
+# and returns the flattened {(source_uid, target_uid, release): (source_name, source_email,
+# target_name, target_email, loc_added, loc_deleted, loc_changed)} edges that
+# write_longitudinal_network_cln_to_file and create_static_cln consume.
+
+def partition_cln_by_release(commit_list_network):
+    """Split the commit list network into one dict per release."""
+    release_clns = {}
+    for cln_key, cln_value in commit_list_network.items():
+        release_clns.setdefault(cln_key[2], {})[cln_key] = cln_value
+    return release_clns
+
+def add_file_edges(flattened_cln, points, on_edge=None):
+    """Pair the touch points of one file into directed user -> user edges, summed into flattened_cln.
+
+    points are (uid, release, name, email, loc_added, loc_deleted, loc_changed) tuples, only points
+    of the same release and of different users are paired, with the LOC of the source. on_edge is
+    called with every (source_point, target_point) pair, e.g. to write the bipartite edge list.
+    This is the nested-loop engine shared by create_bipartite_network_cln and build_release_edges_loop.
+    """
+    for source_point in points:
+        source_uid, source_release, source_aname, source_aemail = source_point[:4]
+        loc_added = int(source_point[4])
+        loc_deleted = int(source_point[5])
+        loc_changed = int(source_point[6])
+        for target_point in points:
+            target_uid = target_point[0]
+            if target_point[1] != source_release or target_uid == source_uid:
+                continue
+            if on_edge is not None:
+                on_edge(source_point, target_point)
+            flattened_cln_key = (source_uid, target_uid, source_release)
+            flattened_cln_value = flattened_cln.get(flattened_cln_key, None)
+            if flattened_cln_value is None:
+                flattened_cln[flattened_cln_key] = (source_aname, source_aemail, target_point[2], target_point[3], loc_added, loc_deleted, loc_changed)
+            else:
+                flattened_cln[flattened_cln_key] = (source_aname, source_aemail, target_point[2], target_point[3],
+                                                    int(flattened_cln_value[4]) + loc_added,
+                                                    int(flattened_cln_value[5]) + loc_deleted,
+                                                    int(flattened_cln_value[6]) + loc_changed)
+
+def build_release_edges_loop(release, release_cln):
+    """Build the directed user -> user edges of a single release by pairing the touch points of every file."""
+    file_points = {}
+    for (uid, file_name, _), cln_value in release_cln.items():
+        file_points.setdefault(file_name, []).append((uid, release, *cln_value))
+
+    flattened_cln = {}
+    for points in file_points.values():
+        add_file_edges(flattened_cln, points)
+    return flattened_cln
+
+def build_release_edges_sparse(release, release_cln):
+    """Build the directed user -> user edges of a single release.
+
+    With A the user x file matrix of LOC and B the binary user x file incidence matrix, the
+    weight of source -> target is (A @ B.T)[source, target]: the LOC the source changed in every
+    file the target also touched. B @ B.T gives the edges themselves, so pairs that only share
+    files with zero LOC are kept like in the nested loop. The names and emails on an edge are the
+    ones of the last commit list row of each user in the release.
+    """
+    # scipy is only needed by this engine
+    from scipy import sparse
+
+    user_index = {}
+    file_index = {}
+    user_info = {}
+    rows = []
+    cols = []
+    loc = []
+    for (uid, file_name, _), cln_value in release_cln.items():
+        rows.append(user_index.setdefault(uid, len(user_index)))
+        cols.append(file_index.setdefault(file_name, len(file_index)))
+        loc.append((int(cln_value[2]), int(cln_value[3]), int(cln_value[4])))
+        user_info[uid] = (cln_value[0], cln_value[1])
+
+    shape = (len(user_index), len(file_index))
+    rows = np.array(rows, dtype=np.int64)
+    cols = np.array(cols, dtype=np.int64)
+    loc = np.array(loc, dtype=np.int64).reshape(-1, 3)
+
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=shape)
+    co_modification = (incidence @ incidence.T).tocoo()
+    off_diagonal = co_modification.row != co_modification.col
+    sources = co_modification.row[off_diagonal]
+    targets = co_modification.col[off_diagonal]
+
+    weights = []
+    for metric in range(3):
+        weighted = sparse.csr_matrix((loc[:, metric], (rows, cols)), shape=shape)
+        projection = (weighted @ incidence.T).tocsr()
+        weights.append(np.asarray(projection[sources, targets]).ravel())
+
+    uids = list(user_index)
+    flattened_cln = {}
+    for source, target, loc_added, loc_deleted, loc_changed in zip(sources.tolist(), targets.tolist(), *(w.tolist() for w in weights)):
+        source_uid = uids[source]
+        target_uid = uids[target]
+        source_aname, source_aemail = user_info[source_uid]
+        target_aname, target_aemail = user_info[target_uid]
+        flattened_cln[(source_uid, target_uid, release)] = (source_aname, source_aemail, target_aname, target_aemail, loc_added, loc_deleted, loc_changed)
+    return flattened_cln
+
+def create_network_cln_sparse(commit_list_network):
+    """Build the flattened edges of every release with sparse matrix products."""
+    flattened_cln = {}
+    release_clns = partition_cln_by_release(commit_list_network)
+    for release, release_cln in tqdm(release_clns.items(), total=len(release_clns), position=0, leave=True, dynamic_ncols=True):
+        flattened_cln.update(build_release_edges_sparse(release, release_cln))
+    return flattened_cln
+
+RELEASE_EDGE_ENGINES = {
+    'loop': build_release_edges_loop,
+    'sparse': build_release_edges_sparse,
+}
+
+def _release_edges_worker(args):
+    release, release_cln, edge_engine = args
+    return release, RELEASE_EDGE_ENGINES[edge_engine](release, release_cln)
+
+def create_network_cln_sharded(commit_list_network, edge_engine='loop', workers=4):
+    """Build every release's edges in a process pool and merge them into one flattened edge dict.
+
+    Releases are independent, so each worker gets one release's slice of the commit list network.
+    Partial results are merged in release order, which keeps the output deterministic.
+    """
+    # multiprocess is only needed when releases are built in parallel
+    from multiprocess import Pool
+
+    release_clns = partition_cln_by_release(commit_list_network)
+    # Largest releases first so a big release doesn't start last and hold up the pool
+    tasks = sorted(release_clns, key=lambda release: len(release_clns[release]), reverse=True)
+    release_edges = {}
+    with Pool(workers) as pool:
+        results = pool.imap_unordered(_release_edges_worker, ((release, release_clns[release], edge_engine) for release in tasks))
+        for release, edges in tqdm(results, total=len(tasks), position=0, leave=True, dynamic_ncols=True):
+            release_edges[release] = edges
+
+    flattened_cln = {}
+    for release in release_clns:
+        flattened_cln.update(release_edges[release])
+    return flattened_cln
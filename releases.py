@@ -0,0 +1,141 @@
+from bisect import bisect_right
+from datetime import datetime, timezone
+import json
+import os
+import subprocess
+import numpy as np
+
+# Helpers for mapping commits onto the releases of a repository.
+
+class ReleaseTimeline:
+    """Sorted release dates answering "next release after a timestamp" with binary search.
+
+    Built once from the tag -> datetime dict returned by `get_release_dates`. Release dates are
+    naive datetimes, so they are converted with `datetime.timestamp()`, the inverse of the
+    `datetime.fromtimestamp()` applied to commit dates, and lookups agree with the linear scan.
+    """
+
+    def __init__(self, release_dates):
+        # Stable sort keeps the first inserted tag when several releases share a date
+        ordered = sorted(release_dates.items(), key=lambda item: item[1])
+        self.tags = [release_tag for release_tag, release_date in ordered]
+        self.timestamps = [release_date.timestamp() for release_tag, release_date in ordered]
+        self._timestamps_array = np.array(self.timestamps, dtype=np.float64)
+        self._tags_array = np.array(self.tags + [None], dtype=object)
+        # Filled by assign_by_ancestry, next_release then answers per commit sha instead of by date
+        self.release_by_sha = None
+
+    def __len__(self):
+        return len(self.tags)
+
+    def next_release(self, authored_date, commit_sha=None):
+        """Return the first release published strictly after the commit timestamp, or None.
+
+        After assign_by_ancestry the first release containing commit_sha is returned instead, commits
+        no locally tagged release contains (unmerged branches, releases without a local tag) fall
+        back to the date.
+        """
+        if self.release_by_sha is not None and commit_sha in self.release_by_sha:
+            return self.release_by_sha[commit_sha]
+        if isinstance(authored_date, datetime):
+            authored_date = authored_date.timestamp()
+        idx = bisect_right(self.timestamps, authored_date)
+        if idx == len(self.tags):
+            return None
+        return self.tags[idx]
+
+    def next_releases(self, authored_dates, commit_shas=None):
+        """Vectorized `next_release` over an array of commit timestamps (and their shas, after assign_by_ancestry)."""
+        idx = np.searchsorted(self._timestamps_array, np.asarray(authored_dates, dtype=np.float64), side='right')
+        releases = self._tags_array[idx]
+        if self.release_by_sha is not None and commit_shas is not None:
+            releases = np.array([self.release_by_sha.get(sha, release) for sha, release in zip(commit_shas, releases)], dtype=object)
+        return releases
+
+    def assign_by_ancestry(self, repo_path, tag_shas):
+        """Map every commit to the earliest release whose tagged commit contains it.
+
+        tag_shas is {tag: commit_sha} as returned by read_local_tags, releases without a local tag
+        are left out. A single `git rev-list --topo-order --parents` walk lists every commit before
+        its parents, so each commit's label (the index of its earliest containing release) is final
+        when it comes up and is pushed down to its parents as the minimum of all child labels.
+        Commits no release contains are left out and next_release falls back to their date.
+        """
+        no_release = len(self.tags)
+        pending = {}
+        for idx, release_tag in enumerate(self.tags):
+            sha = tag_shas.get(release_tag, None)
+            if sha is not None:
+                pending[sha] = min(pending.get(sha, no_release), idx)
+
+        labels = {}
+        if pending:
+            command = ['git', '-C', str(repo_path), 'rev-list', '--topo-order', '--parents', '--stdin']
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, encoding='utf-8')
+            process.stdin.write('\n'.join(pending) + '\n')
+            process.stdin.close()
+            for line in process.stdout:
+                sha, *parents = line.split()
+                label = pending.pop(sha, no_release)
+                labels[sha] = label
+                for parent in parents:
+                    if pending.get(parent, no_release) > label:
+                        pending[parent] = label
+            process.stdout.close()
+            if process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode, command)
+
+        self.release_by_sha = {sha: self.tags[label] for sha, label in labels.items() if label != no_release}
+        return self.release_by_sha
+
+# Annotated tags are peeled (%(*...)) to the commit they point at, lightweight tags have no peeled fields
+TAG_FORMAT = '%(refname:strip=2)%00%(objectname)%00%(committerdate:unix)%00%(*objectname)%00%(*committerdate:unix)'
+
+def read_local_tags(repo_path):
+    """Return {tag: (commit_sha, commit_date)} for every tag of the clone, read in one `git for-each-ref` pass.
+
+    commit_date is the committer date of the tagged commit as a naive UTC datetime, the same value
+    the API returns for `commit.committer.date`. Tags pointing at trees or blobs are skipped.
+    """
+    output = subprocess.run(['git', '-C', str(repo_path), 'for-each-ref', f'--format={TAG_FORMAT}', 'refs/tags'],
+                            check=True, capture_output=True, encoding='utf-8', errors='surrogateescape').stdout
+    tags = {}
+    for line in output.splitlines():
+        tag_name, sha, commit_date, peeled_sha, peeled_commit_date = line.split('\x00')
+        if peeled_sha:
+            sha, commit_date = peeled_sha, peeled_commit_date
+        if not commit_date:
+            continue
+        tags[tag_name] = (sha, datetime.fromtimestamp(int(commit_date), timezone.utc).replace(tzinfo=None))
+    return tags
+
+class ReleaseCache:
+    """Per-repo JSON cache of release `published_at` dates, keyed by tag.
+
+    Tags that turned out to have no published release are stored as None, so a later run only
+    asks the API about tags it has never seen.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.published_at = {}
+        if os.path.exists(path):
+            with open(path, 'r') as cache_file:
+                self.published_at = json.load(cache_file)
+
+    def missing(self, tag_names):
+        return [tag_name for tag_name in tag_names if tag_name not in self.published_at]
+
+    def add(self, tag_name, published_at):
+        self.published_at[tag_name] = published_at
+
+    def release_dates(self):
+        return {tag_name: datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ")
+                for tag_name, published_at in self.published_at.items() if published_at is not None}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(self.published_at, cache_file, indent=1)
+        os.replace(tmp_path, self.path)
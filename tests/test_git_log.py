@@ -0,0 +1,64 @@
+import os
+import subprocess
+import pydriller
+import pytest
+from git_log import iter_numstat, resolve_rename, unquote_path
+
+# The git_log commit source of commits-from-git.py has to report the same file paths as pydriller.
+
+GIT_ENV = {'GIT_AUTHOR_NAME': 'a', 'GIT_AUTHOR_EMAIL': 'a@example.com',
+           'GIT_COMMITTER_NAME': 'a', 'GIT_COMMITTER_EMAIL': 'a@example.com'}
+
+def git(repo_path, *args):
+    subprocess.run(['git', '-C', str(repo_path), *args], check=True, capture_output=True, env={**os.environ, **GIT_ENV})
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+@pytest.fixture
+def repo_path(tmp_path):
+    git(tmp_path, 'init', '-q')
+    write(tmp_path / 'é.txt', 'a\nb\n')
+    write(tmp_path / 'dir' / 'ü.txt', 'a\n')
+    write(tmp_path / 'quote"d.txt', 'a\n')
+    write(tmp_path / 'tab\tname.txt', 'a\n')
+    write(tmp_path / 'dir' / 'sub' / 'a.txt', 'a\n')
+    git(tmp_path, 'add', '-A')
+    git(tmp_path, 'commit', '-q', '-m', 'add')
+    git(tmp_path, 'mv', 'é.txt', 'ë.txt')
+    git(tmp_path, 'mv', 'dir/ü.txt', 'dir/ö.txt')
+    git(tmp_path, 'mv', 'quote"d.txt', 'dir/quote"d.txt')
+    git(tmp_path, 'mv', 'dir/sub/a.txt', 'a.txt')
+    write(tmp_path / 'tab\tname.txt', 'a\nb\n')
+    git(tmp_path, 'commit', '-q', '-a', '-m', 'rename')
+    git(tmp_path, 'rm', '-q', 'tab\tname.txt')
+    git(tmp_path, 'commit', '-q', '-m', 'delete')
+    return tmp_path
+
+def test_unquote_path():
+    assert unquote_path('"\\303\\251.txt"') == 'é.txt'
+    assert unquote_path('"a\\tb\\"c\\\\d"') == 'a\tb"c\\d'
+    assert unquote_path('plain.txt') == 'plain.txt'
+
+def test_resolve_rename():
+    assert resolve_rename('dir/{a.txt => b.txt}') == 'dir/b.txt'
+    assert resolve_rename('{dir/sub => }/a.txt') == 'a.txt'
+    assert resolve_rename('"a\\tb.txt" => "dir/a\\tb.txt"') == 'dir/a\tb.txt'
+
+def test_git_log_paths_match_pydriller(repo_path):
+    # The iter_numstat options used by iter_commits_git_log
+    git_log_rows = {
+        sha: sorted((None if file_name is None else resolve_rename(file_name), additions, deletions)
+                    for file_name, additions, deletions, _ in file_stats)
+        for sha, _, _, _, file_stats in iter_numstat(repo_path, reverse=True, combined_merges=False, binary_as_zero=True,
+                                                      first_parent_merges=True, deletions_as_none=True)
+    }
+    pydriller_rows = {
+        commit.hash: sorted((f.new_path, f.added_lines, f.deleted_lines) for f in commit.modified_files)
+        for commit in pydriller.Repository(str(repo_path)).traverse_commits()
+    }
+    assert git_log_rows == pydriller_rows
+    renamed_paths = {file_name for rows in git_log_rows.values() for file_name, _, _ in rows}
+    assert {'ë.txt', 'dir/ö.txt', 'dir/quote"d.txt', 'a.txt', 'tab\tname.txt', None} <= renamed_paths
@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+
+# Rate-limit-aware scheduling of GitHub API requests over several tokens.
+
+DEFAULT_RATE_LIMIT = 5000  # Requests per hour of an authenticated token
+
+class TokenScheduler:
+    """Dispatches requests to the token with the most rate limit headroom.
+
+    Tracks the remaining quota and reset time of every token from the X-RateLimit-* headers.
+    A token that hits its primary limit is parked until its reset time, and one that hits a
+    secondary limit is parked for Retry-After seconds, or for a jittered exponential backoff
+    when GitHub doesn't send one. The process only sleeps when every token is parked.
+    """
+
+    def __init__(self, tokens, secondary_backoff=60, max_backoff=15 * 60):
+        self.tokens = list(dict.fromkeys(token for token in tokens if token))
+        self.remaining = {token: DEFAULT_RATE_LIMIT for token in self.tokens}
+        self.reset = {token: 0 for token in self.tokens}
+        self.blocked_until = {token: 0 for token in self.tokens}
+        self.secondary_hits = {token: 0 for token in self.tokens}
+        self.secondary_backoff = secondary_backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def headroom(self, token, now=None):
+        now = time.time() if now is None else now
+        if self.blocked_until[token] > now:
+            return 0
+        if not self.reset[token]:
+            # No response seen since the last window, the count is only an estimate
+            return max(1, self.remaining[token])
+        if self.reset[token] <= now:
+            # The rate limit window has rolled over
+            return DEFAULT_RATE_LIMIT
+        return self.remaining[token]
+
+    def total_headroom(self):
+        now = time.time()
+        return sum(self.headroom(token, now) for token in self.tokens)
+
+    def next_available(self):
+        """Time at which the first parked or exhausted token can be used again."""
+        return min(max(self.blocked_until[token], self.reset[token]) for token in self.tokens)
+
+    def acquire(self, cost=1):
+        """Return the token with the most headroom, waiting if every token is exhausted."""
+        if not self.tokens:
+            return None
+        while True:
+            with self.lock:
+                now = time.time()
+                token = max(self.tokens, key=lambda token: self.headroom(token, now))
+                if self.headroom(token, now) > 0:
+                    self.remaining[token] = self.headroom(token, now) - cost
+                    if self.reset[token] <= now:
+                        self.reset[token] = 0
+                    return token
+                # Every token is parked, wait for the first one to come back
+                wake_up = self.next_available()
+            wait_time = max(1, wake_up - time.time()) + random.uniform(0, 5)
+            print(f"All {len(self.tokens)} tokens are rate limited. Waiting for {int(wait_time)} seconds...")
+            time.sleep(wait_time)
+
+    def update(self, token, headers):
+        """Record the rate limit headers of a response sent with token."""
+        if token not in self.remaining or 'X-RateLimit-Remaining' not in headers:
+            return
+        with self.lock:
+            self.remaining[token] = int(headers['X-RateLimit-Remaining'])
+            self.reset[token] = int(headers.get('X-RateLimit-Reset', self.reset[token]))
+            if self.remaining[token] > 0:
+                self.secondary_hits[token] = 0
+
+    def is_rate_limited(self, response):
+        """Check whether a 403/429 response is a primary or secondary rate limit."""
+        if response.status_code not in (403, 429):
+            return False
+        if 'Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining', None) == '0':
+            return True
+        try:
+            message = str(response.json().get('message', ''))
+        except ValueError:
+            message = ''
+        return 'rate limit' in message.lower()
+
+    def backoff(self, token, response):
+        """Park a token after a rate limited response."""
+        if token not in self.remaining:
+            # Unauthenticated requests have nothing to switch to
+            wait_time = int(response.headers.get('Retry-After', self.secondary_backoff))
+            print(f"Rate limit reached. Waiting for {wait_time} seconds...")
+            time.sleep(wait_time)
+            return
+        with self.lock:
+            now = time.time()
+            if 'Retry-After' in response.headers:
+                self.blocked_until[token] = now + int(response.headers['Retry-After'])
+            elif response.headers.get('X-RateLimit-Remaining', None) == '0':
+                self.remaining[token] = 0
+                self.reset[token] = int(response.headers.get('X-RateLimit-Reset', now + self.secondary_backoff))
+                self.blocked_until[token] = self.reset[token]
+            else:
+                # Secondary rate limit without Retry-After, back off exponentially with jitter
+                self.secondary_hits[token] += 1
+                wait_time = min(self.max_backoff, self.secondary_backoff * 2 ** (self.secondary_hits[token] - 1))
+                self.blocked_until[token] = now + wait_time * random.uniform(0.5, 1.5)
@@ -1,42 +1,32 @@
-import pandas as pd
-import csv
+import os
 import json
+from collections import Counter
+from identity import IdentityIndex
+from bot_filter import BotFilter
+from commit_stream import read_commit_chunks, drop_bots, annotate_uids, write_chunks
 
 #This script identifies unique ID for each commiter.
 #Notice that path string in this script is based on initial environment of our exp. Make sure to adjust them to yours before reproduce the analysis.
+#Commits are streamed in chunks of COMMIT_CHUNK_SIZE rows (see commit_stream.py).
+#With FUSED_BOTS_DROPPING=1 the raw commits are read instead and bots are dropped in the same pass, without writing the intermediate file.
 
-csv.field_size_limit(500 * 1024 * 1024)
-
-def data_load(PATH):
-    with open(PATH, encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        commits = [row for row in reader]
-    return commits
-
-def find_id(commit, users):
-    for id in users:
-        for name in users[id]['names']:
-            if name == commit['Author Name']:
-                commit['Author Id'] = id
-                return commit
-    commit['Author Id'] = -1
-    return commit
-    assert False, "Cannot find matching Id"
+FUSED_BOTS_DROPPING = os.environ.get('FUSED_BOTS_DROPPING', '0') == '1'
 
 
 # LOAD EXISTED INFO
 with open('Username_info/tensorflow_after_merging.json') as user_dict:
     users = json.load(user_dict)
-commits = data_load('Commits_bots_dropped/tensorflow_commit_botdropped.csv')
-
-
-# REFER TO USER AND ANNOTATE
-annotated_commits = []
-for commit in commits:
-    annotated_commit = find_id(commit, users)
-    annotated_commits.append(annotated_commit)
-
-# WRITE INTO FILES
-df = pd.DataFrame(annotated_commits)
-df.to_csv('Commits_with_Id/tensorflow_commit_with_Id.csv', index=False, header=True)
+identity_index = IdentityIndex(users)
+if FUSED_BOTS_DROPPING:
+    dropped_names = Counter()
+    chunks = drop_bots(read_commit_chunks('Commit/tensorflow_commit_data.csv'), BotFilter.for_repo('tensorflow/tensorflow'), dropped_names)
+else:
+    chunks = read_commit_chunks('Commits_bots_dropped/tensorflow_commit_botdropped.csv')
+
+
+# REFER TO USER, ANNOTATE AND WRITE INTO FILES
+annotated_num = write_chunks(annotate_uids(chunks, identity_index), 'Commits_with_Id/tensorflow_commit_with_Id.csv')
+if FUSED_BOTS_DROPPING:
+    print('Dropped:', dict(dropped_names))
+print('Annotated:', annotated_num)
 print('DONE')
\ No newline at end of file
@@ -1,6 +1,7 @@
 # coding=utf-8
 import csv
 import json
+import time
 
 #This script merges different usernames of the same committer to clean up our data.
 
@@ -52,7 +53,7 @@ def merging(id_emails_names):
         stop = True
         for i in range(1, upid + 1):
             if i in id_emails_names:
-                for j in range(i + 1, upid):
+                for j in range(i + 1, upid + 1):
                     if j in id_emails_names and (len(id_emails_names[i][0] & id_emails_names[j][0]) > 0 or len(
                             id_emails_names[i][1] & id_emails_names[j][1]) > 0):
                         stop = False
@@ -67,6 +68,65 @@ def merging(id_emails_names):
     return id_emails_names, merged_num
 
 
+class DisjointSet:
+    """Union-find with path compression, the smallest id of a set is its root."""
+
+    def __init__(self, ids):
+        self.parent = {i: i for i in ids}
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i, j):
+        root_i = self.find(i)
+        root_j = self.find(j)
+        if root_i == root_j:
+            return False
+        if root_i > root_j:
+            root_i, root_j = root_j, root_i
+        self.parent[root_j] = root_i
+        return True
+
+
+def merging_union_find(id_emails_names):
+    # Connected components of the name-email bipartite graph, same result as merging() without the sweeps
+    start_time = time.time()
+    upid = len(id_emails_names)
+    print('Initial Nums ', upid)
+    disjoint_set = DisjointSet(id_emails_names)
+    email_owner = {}
+    name_owner = {}
+    union_num = 0
+    for id in id_emails_names:
+        for email in id_emails_names[id][0]:
+            owner = email_owner.setdefault(email, id)
+            if owner != id and disjoint_set.union(owner, id):
+                union_num += 1
+        for name in id_emails_names[id][1]:
+            owner = name_owner.setdefault(name, id)
+            if owner != id and disjoint_set.union(owner, id):
+                union_num += 1
+
+    # Collect every set under its root, roots keep the original id order
+    merged = {}
+    for id in id_emails_names:
+        root = disjoint_set.find(id)
+        if root not in merged:
+            merged[root] = [set(), set()]
+        merged[root][0] |= id_emails_names[id][0]
+        merged[root][1] |= id_emails_names[id][1]
+    print('Union-find: {} unions over {} emails and {} names, remain {}, took {:.2f}s'.format(
+        union_num, len(email_owner), len(name_owner), len(merged), time.time() - start_time))
+    merged_num = upid - len(merged)
+    return merged, merged_num
+
+
 def format_res(id_emails_names):
     users = {}
     real_id = 1
@@ -80,6 +140,8 @@ def format_res(id_emails_names):
 
 
 if __name__ == '__main__':
+    # 'union_find' for the near-linear merger, 'sweep' for the original pairwise iterations
+    MERGING_ENGINE = 'union_find'
     id_emails_names = {}
     id_names_emails = {}
     
@@ -108,7 +170,10 @@ if __name__ == '__main__':
         id_names_emails[_id] = [{name}, name_emails[name]]
         _id += 1
 
-    id_emails_names, merged_num = merging(id_emails_names)
+    if MERGING_ENGINE == 'union_find':
+        id_emails_names, merged_num = merging_union_find(id_emails_names)
+    else:
+        id_emails_names, merged_num = merging(id_emails_names)
 
     users = format_res(id_emails_names)
     res_num = len(users)